@@ -0,0 +1,227 @@
+import logging
+from queue import Empty
+import numpy as np
+from plot_models import HistogramModel, SeriesModel, CorrelationModel
+from key_quality import KeyQualityMonitor, PLACEHOLDER_KEY
+
+SERIES_NAMES = ("qber", "kbps", "visibility", "spd1_decaystate")
+
+
+class Aggregator:
+    # Turns DataProcessor queue items into plot model updates, filling in the values a session did
+    # not report from the one before it. Qt-free, so MainWindow and the headless runner share it.
+    # changes collects the non-plot state that changed ("key", "key_quality", "status") for whoever
+    # displays it. The correlation model sums the per-session results the DataProcessor queues, and
+    # the key quality results are the latest the DataProcessor computed over every key it parsed.
+    # The overlay points the DataProcessor queues from its rolling statistics go to the metric's
+    # overlay models.
+    def __init__(self, plot_window: float = 60.0, histogram_options: dict = None, correlation_options: dict = None):
+        self.hist_model = HistogramModel(**(histogram_options or {}))
+        self.hist2_model = HistogramModel(**(histogram_options or {}))
+        self.correlation_model = CorrelationModel(**(correlation_options or {}))
+        self.qber_model = SeriesModel(plot_window)
+        self.kbps_model = SeriesModel(plot_window)
+        self.visibility_model = SeriesModel(plot_window)
+        self.spd1_model = SeriesModel(plot_window)
+        self.series_models = [self.qber_model, self.kbps_model, self.visibility_model, self.spd1_model]
+        self.series_by_name = dict(zip(SERIES_NAMES, self.series_models))
+        # EWMA, low and high quantile per metric
+        self.overlay_models = {name: tuple(SeriesModel(plot_window) for _ in range(3)) for name in SERIES_NAMES}
+        self.line_models = self.series_models + [model for models in self.overlay_models.values() for model in models]
+        self.plot_models = [self.hist_model, self.hist2_model, self.correlation_model] + self.line_models
+        self.changes = set()
+        self.reset()
+
+    def reset(self):
+        self.session_time = 0.0
+        self.current_session = -1
+        self.session_data_types = set()
+        self.key_text = None
+        self.changes.clear()
+        self.key_quality_results = KeyQualityMonitor().results()
+        self.last_session_data = {
+            "timestamp_spd1": [],
+            "timestamp_spd2": [],
+            "spd1_decaystate": None,
+            "visibility": None,
+            "qber": None,
+            "key": None,
+            "kbps_data": None
+        }
+        for model in self.plot_models:
+            model.clear()
+
+    def drain(self, data_queue, limit: int = None):
+        # Everything already queued, or the first `limit` items, without waiting for more
+        count = 0
+        pending = data_queue.qsize() if limit is None else min(data_queue.qsize(), limit)
+        try:
+            for _ in range(pending):
+                self.process(data_queue.get_nowait())
+                count += 1
+        except Empty:
+            pass
+        return count
+
+    def process(self, data):
+        # Plots run on session time so paced and fast-forwarded replays keep their real spacing
+        if data['type'] == 'session_number':
+            self.session_time = data['time']
+        elif data['type'] == 'session_record':
+            self.session_time = data['value'].time
+        current_time = self.session_time
+        logging.debug(f"Processing data: {data}")
+
+        if data['type'] == 'session_record':
+            self.update('session_record', data['value'], current_time)
+            return
+
+        if data['type'] == 'overlay':
+            self.append_overlay(data['name'], *data['value'])
+            return
+
+        if data['type'] == 'session_number':
+            new_session = data['value']
+            if new_session != self.current_session:
+                expected_types = {'timestamp_spd1', 'timestamp_spd2', 'spd1_decaystate', 'visibility', 'qber'}
+                if new_session % 2 == 0:
+                    expected_types.add('key')
+                else:
+                    expected_types.add('kbps_data')
+                missing_types = expected_types - self.session_data_types
+                if missing_types:
+                    logging.info(f"Session {self.current_session} missing data types: {missing_types}")
+                    if self.current_session == -1:
+                        for data_type in missing_types:
+                            if data_type in ['timestamp_spd1', 'timestamp_spd2']:
+                                continue
+                            elif data_type == 'key':
+                                self.update('key', PLACEHOLDER_KEY, current_time, length=len(PLACEHOLDER_KEY))
+                                self.last_session_data['key'] = PLACEHOLDER_KEY
+                                logging.info(f"Initialized missing {data_type} to '{'0' * 128}' for session {self.current_session}")
+                            else:
+                                # For qber, visibility, kbps_data, spd1_decaystate, set to 0 but do not plot
+                                self.last_session_data[data_type] = 0
+                                logging.info(f"Initialized missing {data_type} to 0 for session {self.current_session}")
+                    else:
+                        for data_type in missing_types:
+                            if data_type in ['timestamp_spd1', 'timestamp_spd2']:
+                                for value in self.last_session_data[data_type]:
+                                    self.update(data_type, value, current_time)
+                            elif self.last_session_data[data_type] is not None:
+                                if data_type == 'key':
+                                    self.update(data_type, self.last_session_data[data_type], current_time, length=len(self.last_session_data[data_type]))
+                                elif data_type == 'kbps_data':
+                                    self.update(data_type, self.last_session_data[data_type], current_time, kbps=True)
+                                else:
+                                    self.update(data_type, self.last_session_data[data_type], current_time)
+                self.current_session = new_session
+                self.session_data_types = set()
+                self.changes.add('status')
+                self.last_session_data["timestamp_spd1"] = []
+                self.last_session_data["timestamp_spd2"] = []
+            return
+
+        self.session_data_types.add(data['type'])
+        self.update(data['type'], data.get('value', data.get('kbps')), current_time, length=data.get('length'), kbps='kbps' in data)
+
+    def update(self, data_type, value, current_time, length=None, kbps=False):
+        if data_type == 'session_record':
+            record = value
+            self.current_session = record.session
+            self.changes.add('status')
+            self.update('timestamp_spd1', record.timestamp_spd1, current_time)
+            self.update('timestamp_spd2', record.timestamp_spd2, current_time)
+            self.last_session_data["timestamp_spd1"] = [record.timestamp_spd1]
+            self.last_session_data["timestamp_spd2"] = [record.timestamp_spd2]
+            if record.correlation is not None:
+                self.correlation_model.add(record.correlation)
+            if record.spd1_decaystate is not None:
+                self.update('spd1_decaystate', record.spd1_decaystate, current_time)
+            if record.visibility is not None:
+                self.update('visibility', record.visibility, current_time)
+            if record.qber is not None:
+                self.update('qber', record.qber, current_time)
+            if record.key is not None:
+                self.update('key', record.key, current_time, length=len(record.key))
+            if record.key_quality is not None:
+                self.update('key_quality', record.key_quality, current_time)
+            if record.kbps is not None:
+                self.update('kbps_data', record.kbps, current_time, kbps=True)
+
+        elif data_type == 'timestamp_spd1':
+            timestamps = np.atleast_1d(np.asarray(value, dtype=np.int64))
+            logging.debug(f"SPD1 timestamps: {timestamps}")
+            self.hist_model.add(timestamps)
+            self.last_session_data["timestamp_spd1"].append(timestamps)
+
+        elif data_type == 'timestamp_spd2':
+            timestamps = np.atleast_1d(np.asarray(value, dtype=np.int64))
+            logging.debug(f"SPD2 timestamps: {timestamps}")
+            self.hist2_model.add(timestamps)
+            self.last_session_data["timestamp_spd2"].append(timestamps)
+
+        elif data_type == 'correlation':
+            self.correlation_model.add(value)
+
+        elif data_type == 'qber':
+            qber_val = float(value)
+            logging.debug(f"QBER: {qber_val}")
+            self.append_metric("qber", current_time, qber_val)
+            self.last_session_data["qber"] = qber_val
+
+        elif data_type == 'kbps_data':
+            kbps = float(value)
+            logging.debug(f"KBPS: {kbps}")
+            self.append_metric("kbps", current_time, kbps)
+            self.last_session_data["kbps_data"] = kbps
+
+        elif data_type == 'key':
+            logging.debug(f"Key (length {length}): {value.text(40)}...")
+            self.key_text = (self.current_session, length, value)
+            self.changes.add('key')
+            self.last_session_data["key"] = value
+
+        elif data_type == 'key_quality':
+            self.key_quality_results = value
+            self.changes.add('key_quality')
+
+        elif data_type == 'visibility':
+            vis_val = float(value)
+            logging.debug(f"Visibility: {vis_val}")
+            self.append_metric("visibility", current_time, vis_val)
+            self.last_session_data["visibility"] = vis_val
+
+        elif data_type == 'spd1_decaystate':
+            spd1_val = float(value)
+            logging.debug(f"SPD1 Decay: {spd1_val}")
+            self.append_metric("spd1_decaystate", current_time, spd1_val)
+            self.last_session_data["spd1_decaystate"] = spd1_val
+
+    def append_metric(self, name, t, value):
+        self.series_by_name[name].append(t, value)
+
+    def append_overlay(self, name, t, ewma, low, high):
+        ewma_model, low_model, high_model = self.overlay_models[name]
+        ewma_model.append(t, ewma)
+        low_model.append(t, low)
+        high_model.append(t, high)
+
+    def summary(self):
+        metrics = {}
+        for name, model in zip(SERIES_NAMES, self.series_models):
+            if len(model):
+                metrics[name] = {"last": float(model.y[-1]), "min": model.min(), "mean": float(model.y.mean()), "max": model.max()}
+        key = self.last_session_data["key"]
+        return {
+            "session": self.current_session,
+            "session_time": self.session_time,
+            "window": metrics,
+            "spd1_histogram": self.hist_model.counts.astype(np.int64).tolist(),
+            "spd2_histogram": self.hist2_model.counts.astype(np.int64).tolist(),
+            "coincidences": self.correlation_model.coincidences,
+            "session_coincidences": self.correlation_model.session_coincidences,
+            "correlation_histogram": self.correlation_model.counts.astype(np.int64).tolist(),
+            "key_length": len(key) if key else 0,
+            "key_quality": self.key_quality_results
+        }
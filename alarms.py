@@ -0,0 +1,264 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from rolling_stats import Welford
+
+MAX_RECENT_EVENTS = 100  # Raised/cleared events kept in memory for displays
+
+
+class AlarmEvent:
+    __slots__ = ("rule", "metric", "state", "session", "value", "detail", "time")
+
+    def __init__(self, rule, state: str, session: int, value: float):
+        self.rule = rule.name
+        self.metric = rule.metric
+        self.state = state
+        self.session = session
+        self.value = value
+        self.detail = rule.describe()
+        self.time = time.time()
+
+    def as_dict(self):
+        return {"time": self.time, "session": self.session, "rule": self.rule, "metric": self.metric,
+                "state": self.state, "value": self.value, "detail": self.detail}
+
+    def __repr__(self):
+        return f"AlarmEvent({self.rule} {self.state} at session {self.session}, {self.metric}={self.value})"
+
+
+class AlarmRule:
+    # A named check on one metric. check() sees the metric's value for every session that
+    # reported it, in session order, and says whether that value violates the rule; the engine
+    # raises the alarm after `consecutive` violating sessions in a row and clears it on the
+    # first session that does not violate it.
+    def __init__(self, name: str, metric: str, consecutive: int = 1):
+        if consecutive < 1:
+            raise ValueError(f"Alarm rule {name} needs at least 1 consecutive violation, got {consecutive}")
+        self.name = name
+        self.metric = metric
+        self.consecutive = consecutive
+        self.clear()
+
+    def clear(self):
+        self.violations = 0
+        self.active = False
+
+    def check(self, t: float, value: float):
+        raise NotImplementedError
+
+    def describe(self):
+        return self.name
+
+
+class ThresholdRule(AlarmRule):
+    # Value above `above` or below `below`
+    def __init__(self, name: str, metric: str, above: float = None, below: float = None, consecutive: int = 1):
+        if above is None and below is None:
+            raise ValueError(f"Threshold rule {name} needs an upper or a lower limit")
+        self.above = float("inf") if above is None else above
+        self.below = float("-inf") if below is None else below
+        super().__init__(name, metric, consecutive)
+
+    def check(self, t: float, value: float):
+        return value > self.above or value < self.below
+
+    def describe(self):
+        limits = []
+        if self.above != float("inf"):
+            limits.append(f"{self.metric} > {self.above:g}")
+        if self.below != float("-inf"):
+            limits.append(f"{self.metric} < {self.below:g}")
+        return " or ".join(limits)
+
+
+class RateOfChangeRule(AlarmRule):
+    # Change per second of session time since the metric's previous value, rising faster than
+    # `max_rise` or falling faster than `max_fall`
+    def __init__(self, name: str, metric: str, max_rise: float = None, max_fall: float = None, consecutive: int = 1):
+        if max_rise is None and max_fall is None:
+            raise ValueError(f"Rate of change rule {name} needs a largest rise or fall")
+        self.max_rise = float("inf") if max_rise is None else max_rise
+        self.max_fall = float("inf") if max_fall is None else max_fall
+        super().__init__(name, metric, consecutive)
+
+    def clear(self):
+        super().clear()
+        self.last_time = None
+        self.last_value = None
+        self.rate = 0.0
+
+    def check(self, t: float, value: float):
+        last_time, last_value = self.last_time, self.last_value
+        self.last_time = t
+        self.last_value = value
+        if last_time is None or t <= last_time:
+            return False
+        self.rate = (value - last_value) / (t - last_time)
+        return self.rate > self.max_rise or -self.rate > self.max_fall
+
+    def describe(self):
+        return f"{self.metric} changing at {self.rate:+.3g}/s"
+
+
+class CusumRule(AlarmRule):
+    # One-sided CUSUM drift detector: sums how far each value lies beyond `target`, in units of
+    # `sigma`, less a `slack` allowance, and flags drift while the sum is above `limit`. Without
+    # a target and sigma they are the mean and standard deviation of the first `warmup` values.
+    # direction is "up" to catch a rising metric and "down" for a falling one.
+    def __init__(self, name: str, metric: str, direction: str = "up", target: float = None, sigma: float = None,
+                 slack: float = 0.5, limit: float = 5.0, warmup: int = 20, consecutive: int = 1):
+        if direction not in ("up", "down"):
+            raise ValueError(f"CUSUM rule {name} direction must be 'up' or 'down', got {direction!r}")
+        if sigma is not None and sigma <= 0:
+            raise ValueError(f"CUSUM rule {name} needs a positive sigma, got {sigma}")
+        self.sign = 1.0 if direction == "up" else -1.0
+        self.fixed_target = target
+        self.fixed_sigma = sigma
+        self.slack = slack
+        self.limit = limit
+        self.warmup = warmup
+        super().__init__(name, metric, consecutive)
+
+    def clear(self):
+        super().clear()
+        self.target = self.fixed_target
+        self.sigma = self.fixed_sigma
+        self.baseline = Welford() if self.target is None or self.sigma is None else None
+        self.sum = 0.0
+
+    def check(self, t: float, value: float):
+        if self.baseline is not None:
+            self.baseline.add(value)
+            if self.baseline.count < self.warmup:
+                return False
+            if self.target is None:
+                self.target = self.baseline.mean
+            if self.sigma is None:
+                self.sigma = max(self.baseline.std(), 1e-9)
+            self.baseline = None
+            return False
+        self.sum = max(0.0, self.sum + self.sign * (value - self.target) / self.sigma - self.slack)
+        return self.sum > self.limit
+
+    def describe(self):
+        if self.target is None:
+            return f"{self.metric} drift (learning baseline)"
+        return f"{self.metric} drifting {'up' if self.sign > 0 else 'down'} from {self.target:.3g} (CUSUM {self.sum:.1f} sigma)"
+
+
+RULE_TYPES = {"threshold": ThresholdRule, "rate": RateOfChangeRule, "cusum": CusumRule}
+
+
+def default_rules():
+    # QBER in percent: BB84 distils no secure key above about 11 %
+    return [
+        ThresholdRule("qber_threshold", "qber", above=11.0, consecutive=3),
+        RateOfChangeRule("qber_jump", "qber", max_rise=20.0, consecutive=2),
+        CusumRule("qber_drift", "qber", direction="up"),
+        ThresholdRule("visibility_low", "visibility", below=0.5, consecutive=3),
+        CusumRule("visibility_drift", "visibility", direction="down")
+    ]
+
+
+def load_rules(path: str):
+    # A JSON list of rules, each an object with a "type" from RULE_TYPES and that rule's arguments, e.g.
+    # [{"type": "threshold", "name": "qber_high", "metric": "qber", "above": 8, "consecutive": 5}]
+    with open(path) as f:
+        specs = json.load(f)
+    rules = []
+    for spec in specs:
+        spec = dict(spec)
+        rule_type = spec.pop("type", None)
+        if rule_type not in RULE_TYPES:
+            raise ValueError(f"Unknown alarm rule type {rule_type!r} in {path}, expected one of {', '.join(RULE_TYPES)}")
+        rules.append(RULE_TYPES[rule_type](**spec))
+    return rules
+
+
+class AlarmEngine:
+    # Evaluates alarm rules against each completed session on the data processor's thread, so
+    # alarms fire as sessions are parsed however far the plots lag behind. Rules are grouped by
+    # metric and each keeps a few numbers of state, so a session costs one check() per rule on
+    # the metrics it reported. Raised and cleared events go to `log_path` as JSON lines and to
+    # the log; active() and `version` let a display poll for changes from any thread. Sessions
+    # going backwards, after a seek or restart, start every rule over.
+    def __init__(self, rules, log_path: str = None):
+        names = [rule.name for rule in rules]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Alarm rule names must be unique, got {names}")
+        self.rules = rules
+        self.rules_by_metric = {}
+        for rule in rules:
+            self.rules_by_metric.setdefault(rule.metric, []).append(rule)
+        self.log_path = log_path
+        self.log_file = None
+        self.lock = threading.Lock()
+        self.active_events = {}  # Rule name -> the event that raised it
+        self.recent = deque(maxlen=MAX_RECENT_EVENTS)
+        self.version = 0  # Bumped on every raised or cleared alarm
+        self.last_session = -1
+
+    def evaluate(self, session: int, t: float, values: dict):
+        # values maps metric names to the session's values; metrics the session did not report are left out
+        with self.lock:
+            if session < self.last_session:
+                self.reset_rules()
+            self.last_session = session
+            for metric, value in values.items():
+                rules = self.rules_by_metric.get(metric)
+                if rules is None:
+                    continue
+                for rule in rules:
+                    if rule.check(t, value):
+                        rule.violations += 1
+                        if not rule.active and rule.violations >= rule.consecutive:
+                            rule.active = True
+                            self.record(AlarmEvent(rule, "raised", session, value))
+                    else:
+                        rule.violations = 0
+                        if rule.active:
+                            rule.active = False
+                            self.record(AlarmEvent(rule, "cleared", session, value))
+
+    def record(self, event: AlarmEvent):
+        if event.state == "raised":
+            self.active_events[event.rule] = event
+            logging.warning(f"Alarm {event.rule} raised at session {event.session}: {event.detail} ({event.metric}={event.value:g})")
+        else:
+            self.active_events.pop(event.rule, None)
+            logging.info(f"Alarm {event.rule} cleared at session {event.session} ({event.metric}={event.value:g})")
+        self.recent.append(event)
+        self.version += 1
+        if self.log_path is None:
+            return
+        try:
+            if self.log_file is None:
+                self.log_file = open(self.log_path, "a")
+            self.log_file.write(json.dumps(event.as_dict()) + "\n")
+            self.log_file.flush()
+        except OSError as e:
+            logging.error(f"Failed to write alarm log {self.log_path}, alarms are no longer logged to it: {e}")
+            self.log_path = None
+
+    def reset_rules(self):
+        for rule in self.rules:
+            rule.clear()
+        self.active_events.clear()
+        self.version += 1
+
+    def active(self):
+        # Events that raised the alarms still active, oldest first
+        with self.lock:
+            return sorted(self.active_events.values(), key=lambda event: event.session)
+
+    def recent_events(self):
+        with self.lock:
+            return list(self.recent)
+
+    def close(self):
+        with self.lock:
+            if self.log_file is not None:
+                self.log_file.close()
+                self.log_file = None
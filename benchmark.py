@@ -0,0 +1,280 @@
+import argparse
+import logging
+import os
+import random
+import re
+import time
+from queue import Queue
+from data_processor import DataProcessor
+from file_tail import FileTail
+from mmap_reader import MmapReader
+
+
+def write_synthetic_output(path, sessions, spd_count=40):
+    rng = random.Random(0)
+    with open(path, "w") as f:
+        f.write("INPUT_STRING:default_input\n")
+        for session_number in range(sessions):
+            f.write(f"SESSION_NUMBER:{session_number}\n")
+            f.write("SPD1_VALUES:\n")
+            f.writelines(f"{rng.randrange(10000)}\n" for _ in range(spd_count))
+            f.write(f"DECOY_STATE_RANDOMNESS_AT_SPD1:{rng.randrange(10000) / 10000.0:.4f}\n")
+            f.write("SPD2_VALUES:\n")
+            f.writelines(f"{rng.randrange(10000)}\n" for _ in range(spd_count))
+            f.write(f"VISIBILITY_RATIO_IS:{rng.randrange(10000) / 10000.0:.4f}\n")
+            f.write(f"SPD1_QBER_VALUE_IS:{rng.randrange(1000) / 100.0:.2f}\n")
+            if session_number % 2 == 0:
+                key = "".join(rng.choice("01") for _ in range(256))
+                f.write("NUMBER_OF_RX_KEY_BITS_AFTER_PRIVACY_AMPLIFICATION_IS:256\n")
+                f.write(f"KEY_BITS:{key}\n")
+            else:
+                f.write(f"KEY_RATE_PER_SECOND_IS:{rng.randrange(1000) / 100.0:.2f}\n")
+            f.write("\n")
+
+
+class LegacyDataProcessor(DataProcessor):
+    # The startswith() chain parse_and_queue used before the dispatch table, kept for comparison
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.last_session_data["timestamp_spd1"] = []
+        self.last_session_data["timestamp_spd2"] = []
+
+    def parse_and_queue(self, line: str):
+        try:
+            if self.stop_event.is_set() and self.mode == "file" and self.file and not self.file.closed:
+                self.file_position = self.file.tell()
+                logging.debug(f"Stopped at file position {self.file_position}")
+                self.file.close()
+                self.file = None
+                return
+
+            if line.startswith("SESSION_NUMBER:"):
+                new_session = int(line.split(':')[1])
+                if new_session != self.current_session:
+                    expected_types = {'timestamp_spd1', 'timestamp_spd2', 'spd1_decaystate', 'visibility', 'qber'}
+                    if self.mode == "console":
+                        expected_types.add('input_string')
+                    if new_session % 2 == 0:
+                        expected_types.add('key')
+                    else:
+                        expected_types.add('kbps_data')
+                    missing_types = expected_types - self.session_data_types
+                    if missing_types:
+                        logging.warning(f"Session {self.current_session} missing data types: {missing_types}")
+                        for data_type in missing_types:
+                            if self.current_session == -1:
+                                if data_type in ['timestamp_spd1', 'timestamp_spd2']:
+                                    continue
+                                elif data_type == 'key':
+                                    self.data_queue.put({"type": "key", "value": "0" * 128, "length": 128})
+                                    self.last_session_data["key"] = "0" * 128
+                                    logging.info(f"Initialized missing {data_type} to '{'0' * 128}' for session {self.current_session}")
+                                elif data_type == 'input_string' and self.mode == "console":
+                                    self.data_queue.put({"type": "input_string", "value": "default_input"})
+                                    self.last_session_data["input_string"] = "default_input"
+                                    logging.info(f"Initialized missing {data_type} to 'default_input' for session {self.current_session}")
+                                elif data_type != 'input_string':
+                                    self.data_queue.put({"type": data_type, "value" if data_type != "kbps_data" else "kbps": 0})
+                                    self.last_session_data[data_type] = 0
+                                    logging.info(f"Initialized missing {data_type} to 0 for session {self.current_session}")
+                            else:
+                                if data_type in ['timestamp_spd1', 'timestamp_spd2']:
+                                    for value in self.last_session_data[data_type]:
+                                        self.data_queue.put({"type": data_type, "value": value})
+                                elif self.last_session_data[data_type] is not None and data_type != 'input_string':
+                                    if data_type == 'key':
+                                        self.data_queue.put({"type": data_type, "value": self.last_session_data[data_type], "length": len(self.last_session_data[data_type])})
+                                    elif data_type == 'kbps_data':
+                                        self.data_queue.put({"type": data_type, "kbps": self.last_session_data[data_type]})
+                                    else:
+                                        self.data_queue.put({"type": data_type, "value": self.last_session_data[data_type]})
+                                elif data_type == 'input_string' and self.mode == "console" and self.last_session_data['input_string'] is not None:
+                                    self.data_queue.put({"type": "input_string", "value": self.last_session_data['input_string']})
+                    self.current_session = new_session
+                    self.spd1_values_mode = False
+                    self.spd2_values_mode = False
+                    self.spd1_count = 0
+                    self.spd2_count = 0
+                    self.session_data_types = set()
+                    self.data_queue.put({"type": "session_number", "value": new_session})
+                    self.last_session_data["timestamp_spd1"] = []
+                    self.last_session_data["timestamp_spd2"] = []
+                    logging.debug(f"Current file position after session: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+                return
+
+            if line == "SPD1_VALUES:":
+                self.spd1_values_mode = True
+                self.spd2_values_mode = False
+                self.spd1_count = 0
+                logging.debug(f"Current file position after SPD1_VALUES: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+                return
+
+            if line == "SPD2_VALUES:":
+                self.spd1_values_mode = False
+                self.spd2_values_mode = True
+                self.spd2_count = 0
+                logging.debug(f"Current file position after SPD2_VALUES: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+                return
+
+            if self.spd1_values_mode and self.spd1_count < 40:
+                timestamp = int(line)
+                self.data_queue.put({"type": "timestamp_spd1", "value": timestamp})
+                self.last_session_data["timestamp_spd1"].append(timestamp)
+                self.spd1_count += 1
+                self.session_data_types.add("timestamp_spd1")
+                if self.spd1_count == 40:
+                    logging.info(f"Completed queuing 40 SPD1 timestamps for session {self.current_session}")
+                logging.debug(f"Current file position after SPD1: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+                return
+
+            if self.spd2_values_mode and self.spd2_count < 40:
+                timestamp = int(line)
+                self.data_queue.put({"type": "timestamp_spd2", "value": timestamp})
+                self.last_session_data["timestamp_spd2"].append(timestamp)
+                self.spd2_count += 1
+                self.session_data_types.add("timestamp_spd2")
+                if self.spd2_count == 40:
+                    logging.info(f"Completed queuing 40 SPD2 timestamps for session {self.current_session}")
+                logging.debug(f"Current file position after SPD2: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+                return
+
+            if line.startswith("DECOY_STATE_RANDOMNESS_AT_SPD1:"):
+                value = float(line.split(':')[1])
+                self.data_queue.put({"type": "spd1_decaystate", "value": value})
+                self.last_session_data["spd1_decaystate"] = value
+                self.session_data_types.add("spd1_decaystate")
+                logging.debug(f"Current file position after spd1_decaystate: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+                return
+
+            if line.startswith("VISIBILITY_RATIO_IS:"):
+                value = float(line.split(':')[1])
+                self.data_queue.put({"type": "visibility", "value": value})
+                self.last_session_data["visibility"] = value
+                self.session_data_types.add("visibility")
+                logging.debug(f"Current file position after visibility: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+                return
+
+            if line.startswith("SPD1_QBER_VALUE_IS:"):
+                value = float(line.split(':')[1])
+                self.data_queue.put({"type": "qber", "value": value})
+                self.last_session_data["qber"] = value
+                self.session_data_types.add("qber")
+                logging.debug(f"Current file position after qber: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+                return
+
+            if line.startswith("NUMBER_OF_RX_KEY_BITS_AFTER_PRIVACY_AMPLIFICATION_IS:"):
+                logging.debug(f"Current file position after key_bits_length: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+                return
+
+            if line.startswith("KEY_BITS:"):
+                key_match = re.match(r"KEY_BITS:([01]{128,})", line)
+                if key_match:
+                    key = key_match.group(1)
+                    self.data_queue.put({"type": "key", "value": key, "length": len(key)})
+                    self.last_session_data["key"] = key
+                    self.session_data_types.add("key")
+                    logging.debug(f"Queued key (length {len(key)}): {key[:40]}... for session {self.current_session}")
+                    logging.debug(f"Current file position after key: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+                else:
+                    logging.error(f"Invalid key format: {line}")
+                return
+
+            if line.startswith("KEY_RATE_PER_SECOND_IS:"):
+                kbps = float(line.split(':')[1])
+                self.data_queue.put({"type": "kbps_data", "kbps": kbps})
+                self.last_session_data["kbps_data"] = kbps
+                self.session_data_types.add("kbps_data")
+                logging.debug(f"Queued kbps: {kbps} for session {self.current_session}")
+                logging.debug(f"Current file position after kbps: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+                return
+
+            if line.startswith("INPUT_STRING:") and self.mode == "console":
+                input_str = line.split(':', 1)[1]
+                self.data_queue.put({"type": "input_string", "value": input_str})
+                self.last_session_data["input_string"] = input_str
+                self.session_data_types.add("input_string")
+                logging.debug(f"Queued input string: {input_str} for session {self.current_session}")
+                logging.debug(f"Current file position after input_string: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+                return
+
+        except Exception as e:
+            logging.error(f"Error parsing line '{line}': {e}")
+
+
+def bench_parser(processor_class, lines, repeat):
+    best = None
+    for _ in range(repeat):
+        processor = processor_class(Queue(), mode="file")
+        started = time.perf_counter()
+        for line in lines:
+            processor.parse_and_queue(line)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(lines) / best
+
+
+def replay_readline(processor, path):
+    # The file-mode loop of read_output without the wait for new data at the end
+    tail = FileTail(path, processor.stop_event)
+    while True:
+        raw_line = tail.readline()
+        if not raw_line:
+            break
+        line = raw_line.strip()
+        if line:
+            processor.parse_and_queue(line)
+        else:
+            processor.complete_session()
+    tail.close()
+
+
+def replay_mmap(processor, path):
+    reader = MmapReader(path)
+    reader.replay(processor)
+    reader.close()
+
+
+def bench_reader(replay, path, repeat, **options):
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    best = None
+    for _ in range(repeat):
+        processor = DataProcessor(Queue(), mode="file", index_sessions=False, **options)
+        started = time.perf_counter()
+        replay(processor, path)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return size_mb / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the QKD output parser and file readers")
+    parser.add_argument("--file", default=os.path.join("build", "output.txt"))
+    parser.add_argument("--sessions", type=int, default=20000, help="sessions to generate when --file does not exist")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.file):
+        print(f"{args.file} not found, generating {args.sessions} synthetic sessions")
+        os.makedirs(os.path.dirname(args.file) or ".", exist_ok=True)
+        write_synthetic_output(args.file, args.sessions)
+    with open(args.file, "r") as f:
+        lines = [line.strip() for line in f]
+    lines = [line for line in lines if line]
+
+    logging.disable(logging.CRITICAL)
+    before = bench_parser(LegacyDataProcessor, lines, args.repeat)
+    after = bench_parser(DataProcessor, lines, args.repeat)
+    print(f"parser: {len(lines)} lines")
+    print(f"  startswith chain: {before:12,.0f} lines/s")
+    print(f"  dispatch table:   {after:12,.0f} lines/s ({after / before:.2f}x)")
+
+    print(f"file replay: {os.path.getsize(args.file) / (1024 * 1024):.1f} MB")
+    for batch_sessions in (False, True):
+        readline_rate = bench_reader(replay_readline, args.file, args.repeat, batch_sessions=batch_sessions)
+        mmap_rate = bench_reader(replay_mmap, args.file, args.repeat, batch_sessions=batch_sessions)
+        label = "session records" if batch_sessions else "per-value items "
+        print(f"  {label}  readline: {readline_rate:8.1f} MB/s   mmap: {mmap_rate:8.1f} MB/s ({mmap_rate / readline_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
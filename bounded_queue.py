@@ -0,0 +1,126 @@
+import logging
+from queue import Queue
+import numpy as np
+from data_processor import SessionRecord
+
+TIMESTAMP_TYPES = ("timestamp_spd1", "timestamp_spd2")
+SCALAR_TYPES = ("spd1_decaystate", "visibility", "qber", "kbps_data", "key", "key_quality", "input_string")
+QUEUE_POLICIES = ("block", "drop_oldest", "coalesce")
+# Timestamps a coalesced array keeps per SPD (1.6 MB of int64), so a long stall does not grow the
+# queue without bound. The newest are kept and the older ones counted in trimmed_timestamps.
+MAX_COALESCED_TIMESTAMPS = 200000
+
+
+def newest_timestamps(arrays):
+    # The newest MAX_COALESCED_TIMESTAMPS of the arrays, in order, and how many older ones were left out.
+    # Only the kept tails are copied, the whole backlog is never concatenated.
+    kept = []
+    total = 0
+    for array in reversed(arrays):
+        if total >= MAX_COALESCED_TIMESTAMPS:
+            break
+        kept.append(array[-(MAX_COALESCED_TIMESTAMPS - total):])
+        total += len(kept[-1])
+    kept.reverse()
+    return np.concatenate(kept), sum(len(array) for array in arrays) - total
+
+
+def merge_session_records(records):
+    # The merged record and the number of timestamps left out of it
+    merged = SessionRecord(records[-1].session)
+    for name in SessionRecord.__slots__:
+        setattr(merged, name, getattr(records[-1], name))
+    merged.timestamp_spd1, trimmed_spd1 = newest_timestamps([record.timestamp_spd1 for record in records])
+    merged.timestamp_spd2, trimmed_spd2 = newest_timestamps([record.timestamp_spd2 for record in records])
+    merged.missing_types = set().union(*(record.missing_types for record in records))
+    merged.correlation = merge_correlations([record.correlation for record in records if record.correlation is not None])
+    return merged, trimmed_spd1 + trimmed_spd2
+
+
+def merge_correlations(correlations):
+    # Per-session results add up, the timestamps they came from are never mixed across sessions
+    if not correlations:
+        return None
+    merged = correlations[0]
+    for correlation in correlations[1:]:
+        merged = merged.merged_with(correlation)
+    return merged
+
+
+class BoundedQueue(Queue):
+    # Queue between DataProcessor and MainWindow with a hard size limit. What happens when it is full
+    # depends on the policy:
+    #   block        put() waits for the GUI to make room, which holds the reader back
+    #   drop_oldest  the oldest pending item is discarded
+    #   coalesce     pending scalar metrics and overlay points collapse to their latest value per type
+    #                and metric, timestamp arrays and session records are concatenated, so histogram
+    #                counts stay exact up to MAX_COALESCED_TIMESTAMPS per SPD, and per-session
+    #                correlation results are summed
+    def __init__(self, maxsize: int = 10000, policy: str = "coalesce"):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy {policy!r}, expected one of {QUEUE_POLICIES}")
+        super().__init__(maxsize)
+        self.policy = policy
+        self.dropped = 0
+        self.coalesced = 0
+        self.trimmed_timestamps = 0
+
+    def put(self, item, block=True, timeout=None):
+        if self.policy == "block":
+            return super().put(item, block, timeout)
+        with self.not_full:
+            if self._qsize() >= self.maxsize:
+                if self.policy == "coalesce":
+                    self.compact()
+                if self._qsize() >= self.maxsize:
+                    self.queue.popleft()
+                    self.dropped += 1
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def compact(self):
+        timestamps = {}
+        latest = {}
+        records = []
+        correlations = []
+        session = None
+        others = []
+        for item in self.queue:
+            data_type = item["type"]
+            if data_type in TIMESTAMP_TYPES:
+                timestamps.setdefault(data_type, []).append(np.atleast_1d(item["value"]))
+            elif data_type in SCALAR_TYPES:
+                latest.pop(data_type, None)
+                latest[data_type] = item
+            elif data_type == "session_record":
+                records.append(item["value"])
+            elif data_type == "overlay":
+                latest.pop(("overlay", item["name"]), None)
+                latest[("overlay", item["name"])] = item
+            elif data_type == "correlation":
+                correlations.append(item["value"])
+            elif data_type == "session_number":
+                session = item
+            else:
+                others.append(item)
+        compacted = others
+        if session is not None:
+            compacted.append(session)
+        for data_type, arrays in timestamps.items():
+            merged, trimmed = newest_timestamps(arrays)
+            self.trimmed_timestamps += trimmed
+            compacted.append({"type": data_type, "value": merged})
+        compacted.extend(latest.values())
+        if correlations:
+            compacted.append({"type": "correlation", "value": merge_correlations(correlations)})
+        if records:
+            merged, trimmed = merge_session_records(records)
+            self.trimmed_timestamps += trimmed
+            compacted.append({"type": "session_record", "value": merged})
+        coalesced = len(self.queue) - len(compacted)
+        self.coalesced += coalesced
+        self.unfinished_tasks -= coalesced
+        self.queue.clear()
+        self.queue.extend(compacted)
+        logging.debug(f"Coalesced {coalesced} queued items, {len(compacted)} left")
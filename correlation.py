@@ -0,0 +1,91 @@
+import numpy as np
+
+# Above this many SPD1/SPD2 pairs per timestamp the delay histogram is taken from an FFT of the
+# binned timestamps instead of listing the pairs, which keeps a session's cost near-linear
+MAX_PAIRS_PER_TIMESTAMP = 32
+
+
+def coincidence_count(spd1, sorted_spd2, window: int):
+    # Pairs with |t2 - t1| <= window. Each SPD1 timestamp finds its run of matches in the sorted
+    # SPD2 timestamps with two binary searches, O(n log m) however dense the timestamps are, and
+    # close to a linear merge when spd1 is sorted as well.
+    first = np.searchsorted(sorted_spd2, spd1 - window, side="left")
+    last = np.searchsorted(sorted_spd2, spd1 + window, side="right")
+    return int((last - first).sum())
+
+
+def delay_pairs(spd1, sorted_spd2, first, last):
+    # t2 - t1 for every pair in the runs [first, last) of sorted_spd2, as one vectorized gather
+    runs = last - first
+    total = int(runs.sum())
+    owner = np.repeat(np.arange(len(spd1)), runs)
+    run_starts = np.cumsum(runs) - runs
+    index = first[owner] + (np.arange(total) - run_starts[owner])
+    return sorted_spd2[index] - spd1[owner]
+
+
+def binned_cross_correlation(spd1, spd2, bin_width: int, max_lag: int):
+    # Counts of t2 - t1 per lag of whole bins in [-max_lag, max_lag), from the FFT of the two
+    # binned series. Binning blurs each delay by up to one bin either side.
+    origin = min(spd1.min(), spd2.min())
+    a = np.bincount((spd1 - origin) // bin_width)
+    b = np.bincount((spd2 - origin) // bin_width)
+    size = 1 << int(max(len(a), len(b)) + max_lag).bit_length()
+    correlation = np.fft.irfft(np.conj(np.fft.rfft(a, size)) * np.fft.rfft(b, size), size)
+    lags = np.arange(-max_lag, max_lag)
+    return np.maximum(np.rint(correlation[lags % size]), 0)
+
+
+def check_correlation_options(bins: int, bin_width: int, window: int):
+    if bins < 2 or bins % 2 or bin_width < 1:
+        raise ValueError(f"Correlation needs an even number of bins of at least 1 ps, got {bins} x {bin_width} ps")
+    if window < 0:
+        raise ValueError(f"Coincidence window must not be negative, got {window} ps")
+
+
+class SessionCorrelation:
+    # Coincidences and delay histogram counts of one session, or of several consecutive ones when
+    # queued results are coalesced. last_coincidences is the count of the newest session.
+    __slots__ = ("sessions", "coincidences", "last_coincidences", "counts")
+
+    def __init__(self, sessions: int, coincidences: int, last_coincidences: int, counts):
+        self.sessions = sessions
+        self.coincidences = coincidences
+        self.last_coincidences = last_coincidences
+        self.counts = counts
+
+    def merged_with(self, later):
+        return SessionCorrelation(self.sessions + later.sessions, self.coincidences + later.coincidences,
+                                  later.last_coincidences, self.counts + later.counts)
+
+    def __repr__(self):
+        return f"SessionCorrelation(sessions={self.sessions}, coincidences={self.coincidences})"
+
+
+class Correlator:
+    # Correlates each session's SPD1 and SPD2 timestamps on the DataProcessor thread, where a
+    # session's timestamps are still together: the number of pairs within `window` ps, and a
+    # histogram of t2 - t1 in `bins` bins of `bin_width` ps centred on zero. Only the result is
+    # queued, so coalescing the queue never pairs timestamps of different sessions.
+    def __init__(self, bins: int = 40, bin_width: int = 50, window: int = 100):
+        check_correlation_options(bins, bin_width, window)
+        self.bins = bins
+        self.bin_width = bin_width
+        self.window = window
+        self.max_delay = bins // 2 * bin_width
+
+    def correlate(self, spd1, spd2):
+        if not len(spd1) or not len(spd2):
+            return SessionCorrelation(1, 0, 0, np.zeros(self.bins, dtype=np.int64))
+        spd1 = np.sort(np.asarray(spd1, dtype=np.int64))
+        sorted_spd2 = np.sort(np.asarray(spd2, dtype=np.int64))
+        coincidences = coincidence_count(spd1, sorted_spd2, self.window)
+        # Half-open [-max_delay, max_delay) like the histogram bins
+        first = np.searchsorted(sorted_spd2, spd1 - self.max_delay, side="left")
+        last = np.searchsorted(sorted_spd2, spd1 + self.max_delay, side="left")
+        if (last - first).sum() <= MAX_PAIRS_PER_TIMESTAMP * (len(spd1) + len(spd2)):
+            delays = delay_pairs(spd1, sorted_spd2, first, last)
+            counts = np.bincount((delays + self.max_delay) // self.bin_width, minlength=self.bins)
+        else:
+            counts = binned_cross_correlation(spd1, sorted_spd2, self.bin_width, self.bins // 2).astype(np.int64)
+        return SessionCorrelation(1, coincidences, coincidences, counts)
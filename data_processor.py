@@ -765,16 +765,83 @@ class DataProcessor:
         
 import subprocess
 import os
-from queue import Queue
+from queue import Queue, Full
 import threading
 import logging
 import re
+import time
+import numpy as np
+from file_tail import FileTail
+from mmap_reader import MmapReader
+from session_index import SessionIndex
+from key_quality import PackedKey, PLACEHOLDER_KEY, KeyQualityMonitor
+from correlation import Correlator
+from rolling_stats import RollingStats
 
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
+KEY_BITS_PATTERN = re.compile(r"([01]{128,})")
+EMPTY_TIMESTAMPS = np.empty(0, dtype=np.int64)
+SESSION_INTERVAL = 0.5  # seconds between sessions written by c_program
+STOP_TIMEOUT = 2.0  # seconds stop() waits for the reader thread to close its file and exit
+OVERLAY_QUANTILES = (0.05, 0.95)  # Window quantiles drawn as a band around each line
+OVERLAY_INTERVAL = 0.02  # Wall-clock seconds between overlay points of a metric, about one display frame
+
+class SessionRecord:
+    __slots__ = ("session", "time", "timestamp_spd1", "timestamp_spd2", "spd1_decaystate", "visibility",
+                 "qber", "key", "kbps", "input_string", "missing_types", "correlation", "key_quality")
+
+    def __init__(self, session: int):
+        self.session = session
+        self.time = session * SESSION_INTERVAL
+        self.timestamp_spd1 = None
+        self.timestamp_spd2 = None
+        self.spd1_decaystate = None
+        self.visibility = None
+        self.qber = None
+        self.key = None
+        self.kbps = None
+        self.input_string = None
+        self.missing_types = set()
+        self.correlation = None
+        self.key_quality = None
+
+    def __repr__(self):
+        return (f"SessionRecord(session={self.session}, spd1={len(self.timestamp_spd1)}, spd2={len(self.timestamp_spd2)}, "
+                f"qber={self.qber}, visibility={self.visibility}, kbps={self.kbps})")
+
 class DataProcessor:
-    def __init__(self, data_queue: Queue, mode: str = "file", file_position: int = 0, input_string: str = None):
+    def __init__(self, data_queue: Queue, mode: str = "file", file_position: int = 0, input_string: str = None,
+                 batch_sessions: bool = False, spd_block_size: int = 40, mmap_replay: bool = False,
+                 index_sessions: bool = True, replay_speed: float = None, key_vault=None, alarm_engine=None,
+                 correlation_options: dict = None, key_quality: KeyQualityMonitor = None,
+                 stats_window: float = 60.0, stats: RollingStats = None):
         self.data_queue = data_queue
+        # Randomness tests over every parsed key, before the queue can coalesce any away. A
+        # resumed processor is handed the monitor of the one it replaces to carry on from.
+        self.key_quality = key_quality if key_quality is not None else KeyQualityMonitor()
+        self.key_quality_results = self.key_quality.results()
+        self.correlation_options = correlation_options
+        self.correlator = Correlator(**(correlation_options or {}))
+        self.key_vault = key_vault  # Shared KeyVault that every parsed key is appended to, if any
+        self.alarm_engine = alarm_engine  # Shared AlarmEngine that every completed session is checked by, if any
+        self.session_values = {}  # Metric values parsed in the current session, by statistic name
+        # Running statistics of every parsed metric value, read with statistics() from any thread,
+        # with quantiles over the last `stats_window` seconds. They are the only ones kept: at most
+        # every OVERLAY_INTERVAL a metric's short EWMA and OVERLAY_QUANTILES are queued as an
+        # overlay point for the plots. A resumed processor is handed the stats of the one it replaces.
+        self.stats_window = stats_window
+        self.stats = stats if stats is not None else RollingStats(stats_window)
+        self.stats_lock = threading.Lock()
+        self.overlay_due = {}  # Metric name -> monotonic time its next overlay point is due
+        self.replay_speed = replay_speed
+        self.replay_anchor = None
+        self.index_sessions = index_sessions
+        self.mmap_replay = mmap_replay
+        self.batch_sessions = batch_sessions
+        self.spd_block_size = spd_block_size
+        self.spd_block = []
+        self.session_completed = True
         self.mode = mode
         self.input_string = input_string
         self.process = None
@@ -791,9 +858,11 @@ class DataProcessor:
         self.file_position = file_position
         self.c_program_path = os.path.join("build", "c_program.exe")
         self.output_file_path = os.path.join("build", "output.txt")
+        self.session_index = SessionIndex(self.output_file_path) if mode == "file" and index_sessions else None
+        self.session_offset = None
         self.last_session_data = {
-            "timestamp_spd1": [],
-            "timestamp_spd2": [],
+            "timestamp_spd1": EMPTY_TIMESTAMPS,
+            "timestamp_spd2": EMPTY_TIMESTAMPS,
             "spd1_decaystate": None,
             "visibility": None,
             "qber": None,
@@ -801,6 +870,18 @@ class DataProcessor:
             "kbps_data": None,
             "input_string": None
         }
+        self.line_handlers = {
+            "SESSION_NUMBER": self.handle_session_number,
+            "SPD1_VALUES": self.handle_spd1_values,
+            "SPD2_VALUES": self.handle_spd2_values,
+            "DECOY_STATE_RANDOMNESS_AT_SPD1": self.handle_spd1_decaystate,
+            "VISIBILITY_RATIO_IS": self.handle_visibility,
+            "SPD1_QBER_VALUE_IS": self.handle_qber,
+            "NUMBER_OF_RX_KEY_BITS_AFTER_PRIVACY_AMPLIFICATION_IS": self.handle_key_bits_length,
+            "KEY_BITS": self.handle_key,
+            "KEY_RATE_PER_SECOND_IS": self.handle_kbps,
+            "INPUT_STRING": self.handle_input_string
+        }
 
     def start(self):
         if not self.running:
@@ -819,7 +900,7 @@ class DataProcessor:
                     cmd.append(self.input_string)
                 else:
                     cmd.append("default_input")
-                self.process = subprocess.Popen(
+                process = self.process = subprocess.Popen(
                     cmd,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.PIPE,
@@ -827,32 +908,47 @@ class DataProcessor:
                     bufsize=1
                 )
                 while self.running and not self.stop_event.is_set():
-                    line = self.process.stdout.readline().strip()
-                    if not line and self.process.poll() is not None:
+                    line = process.stdout.readline().strip()
+                    if not line and process.poll() is not None:
                         logging.info("Subprocess terminated")
+                        self.complete_session()
                         self.running = False
                         break
                     if line:
                         logging.debug(f"Read line from console: {line}")
                         self.parse_and_queue(line)
+                    else:
+                        self.complete_session()
             except Exception as e:
                 logging.error(f"Failed to start subprocess: {e}")
                 self.running = False
 
         elif self.mode == "file":
             try:
-                self.file = open(self.output_file_path, "r")
+                if self.mmap_replay:
+                    self.file = MmapReader(self.output_file_path, self.file_position)
+                    logging.debug(f"Replaying mapped file from position {self.file_position}")
+                    self.file.replay(self)
+                    self.file_position = self.file.tell()
+                    if self.stop_event.is_set():
+                        return
+                    self.file.close()
+                    logging.info(f"Replayed {self.output_file_path} up to position {self.file_position}, following new data")
+                self.file = FileTail(self.output_file_path, self.stop_event)
                 logging.debug(f"Opened file at position {self.file_position}")
                 if self.file_position > 0:
                     self.file.seek(self.file_position)
                     logging.debug(f"Seeking to file position {self.file_position}")
                 while self.running and not self.stop_event.is_set():
-                    line = self.file.readline().strip()
-                    if not line:
+                    raw_line = self.file.readline()
+                    if not raw_line:
                         if self.stop_event.is_set():
                             break
-                        import time
-                        time.sleep(0.5)
+                        self.file.wait()
+                        continue
+                    line = raw_line.strip()
+                    if not line:
+                        self.complete_session()
                         continue
                     logging.debug(f"Read line from file: {line}")
                     self.parse_and_queue(line)
@@ -860,191 +956,327 @@ class DataProcessor:
                 logging.error(f"Failed to read file: {e}")
                 self.running = False
             finally:
+                # Only this thread closes the file, stop() wakes it and waits for it to get here
                 if self.file and not self.file.closed:
+                    self.file_position = self.file.tell()
                     self.file.close()
                     self.file = None
+                if self.session_index is not None:
+                    self.session_index.flush()
 
-    def parse_and_queue(self, line: str):
-        try:
-            if self.stop_event.is_set() and self.mode == "file" and self.file and not self.file.closed:
-                self.file_position = self.file.tell()
-                logging.debug(f"Stopped at file position {self.file_position}")
-                self.file.close()
-                self.file = None
-                return
-
-            if line.startswith("SESSION_NUMBER:"):
-                new_session = int(line.split(':')[1])
-                if new_session != self.current_session:
-                    expected_types = {'timestamp_spd1', 'timestamp_spd2', 'spd1_decaystate', 'visibility', 'qber'}
-                    if self.mode == "console":
-                        expected_types.add('input_string')
-                    if new_session % 2 == 0:
-                        expected_types.add('key')
-                    else:
-                        expected_types.add('kbps_data')
-                    missing_types = expected_types - self.session_data_types
-                    if missing_types:
-                        logging.warning(f"Session {self.current_session} missing data types: {missing_types}")
-                        for data_type in missing_types:
-                            if self.current_session == -1:
-                                if data_type in ['timestamp_spd1', 'timestamp_spd2']:
-                                    continue
-                                elif data_type == 'key':
-                                    self.data_queue.put({"type": "key", "value": "0" * 128, "length": 128})
-                                    self.last_session_data["key"] = "0" * 128
-                                    logging.info(f"Initialized missing {data_type} to '{'0' * 128}' for session {self.current_session}")
-                                elif data_type == 'input_string' and self.mode == "console":
-                                    self.data_queue.put({"type": "input_string", "value": "default_input"})
-                                    self.last_session_data["input_string"] = "default_input"
-                                    logging.info(f"Initialized missing {data_type} to 'default_input' for session {self.current_session}")
-                                elif data_type != 'input_string':
-                                    self.data_queue.put({"type": data_type, "value" if data_type != "kbps_data" else "kbps": 0})
-                                    self.last_session_data[data_type] = 0
-                                    logging.info(f"Initialized missing {data_type} to 0 for session {self.current_session}")
-                            else:
-                                if data_type in ['timestamp_spd1', 'timestamp_spd2']:
-                                    for value in self.last_session_data[data_type]:
-                                        self.data_queue.put({"type": data_type, "value": value})
-                                elif self.last_session_data[data_type] is not None and data_type != 'input_string':
-                                    if data_type == 'key':
-                                        self.data_queue.put({"type": data_type, "value": self.last_session_data[data_type], "length": len(self.last_session_data[data_type])})
-                                    elif data_type == 'kbps_data':
-                                        self.data_queue.put({"type": data_type, "kbps": self.last_session_data[data_type]})
-                                    else:
-                                        self.data_queue.put({"type": data_type, "value": self.last_session_data[data_type]})
-                                elif data_type == 'input_string' and self.mode == "console" and self.last_session_data['input_string'] is not None:
-                                    self.data_queue.put({"type": "input_string", "value": self.last_session_data['input_string']})
-                    self.current_session = new_session
-                    self.spd1_values_mode = False
-                    self.spd2_values_mode = False
-                    self.spd1_count = 0
-                    self.spd2_count = 0
-                    self.session_data_types = set()
-                    self.data_queue.put({"type": "session_number", "value": new_session})
-                    self.last_session_data["timestamp_spd1"] = []
-                    self.last_session_data["timestamp_spd2"] = []
-                    logging.debug(f"Current file position after session: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
-                return
-
-            if line == "SPD1_VALUES:":
-                self.spd1_values_mode = True
-                self.spd2_values_mode = False
-                self.spd1_count = 0
-                logging.debug(f"Current file position after SPD1_VALUES: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
-                return
-
-            if line == "SPD2_VALUES:":
-                self.spd1_values_mode = False
-                self.spd2_values_mode = True
-                self.spd2_count = 0
-                logging.debug(f"Current file position after SPD2_VALUES: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
-                return
-
-            if self.spd1_values_mode and self.spd1_count < 40:
-                timestamp = int(line)
-                self.data_queue.put({"type": "timestamp_spd1", "value": timestamp})
-                self.last_session_data["timestamp_spd1"].append(timestamp)
-                self.spd1_count += 1
-                self.session_data_types.add("timestamp_spd1")
-                if self.spd1_count == 40:
-                    logging.info(f"Completed queuing 40 SPD1 timestamps for session {self.current_session}")
-                logging.debug(f"Current file position after SPD1: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
-                return
-
-            if self.spd2_values_mode and self.spd2_count < 40:
-                timestamp = int(line)
-                self.data_queue.put({"type": "timestamp_spd2", "value": timestamp})
-                self.last_session_data["timestamp_spd2"].append(timestamp)
-                self.spd2_count += 1
-                self.session_data_types.add("timestamp_spd2")
-                if self.spd2_count == 40:
-                    logging.info(f"Completed queuing 40 SPD2 timestamps for session {self.current_session}")
-                logging.debug(f"Current file position after SPD2: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
-                return
-
-            if line.startswith("DECOY_STATE_RANDOMNESS_AT_SPD1:"):
-                value = float(line.split(':')[1])
-                self.data_queue.put({"type": "spd1_decaystate", "value": value})
-                self.last_session_data["spd1_decaystate"] = value
-                self.session_data_types.add("spd1_decaystate")
-                logging.debug(f"Current file position after spd1_decaystate: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+    def enqueue(self, data: dict):
+        # With a bounded "block" queue a full queue holds the reader back, but stop() must still get through
+        while True:
+            try:
+                self.data_queue.put(data, timeout=0.1)
                 return
+            except Full:
+                if self.stop_event.is_set():
+                    return
+
+    def queue_data(self, data: dict):
+        if not self.batch_sessions:
+            self.enqueue(data)
+
+    def complete_session(self):
+        if self.session_completed or self.current_session == -1:
+            return
+        self.session_completed = True
+        self.flush_spd_block()
+        if self.alarm_engine is not None:
+            self.alarm_engine.evaluate(self.current_session, self.current_session * SESSION_INTERVAL, self.session_values)
+        correlation = self.correlator.correlate(self.last_session_data["timestamp_spd1"], self.last_session_data["timestamp_spd2"])
+        self.queue_data({"type": "correlation", "value": correlation})
+        if self.session_index is not None and self.session_offset is not None:
+            self.session_index.add(self.current_session, self.session_offset, *(
+                self.last_session_data[data_type] if data_type in self.session_data_types else None
+                for data_type in ("qber", "visibility", "kbps_data")))
+        if not self.batch_sessions:
+            return
+        record = SessionRecord(self.current_session)
+        expected_types = {'spd1_decaystate', 'visibility', 'qber'}
+        if self.mode == "console":
+            expected_types.add('input_string')
+        expected_types.add('key' if self.current_session % 2 == 0 else 'kbps_data')
+        record.missing_types = expected_types - self.session_data_types
+        if record.missing_types:
+            logging.warning(f"Session {self.current_session} missing data types: {record.missing_types}")
+        record.timestamp_spd1 = self.last_session_data["timestamp_spd1"]
+        record.timestamp_spd2 = self.last_session_data["timestamp_spd2"]
+        # Values missing from this session carry over from the last session that had them
+        record.spd1_decaystate = self.last_session_data["spd1_decaystate"]
+        record.visibility = self.last_session_data["visibility"]
+        record.qber = self.last_session_data["qber"]
+        if 'key' in expected_types or 'key' in self.session_data_types:
+            record.key = self.last_session_data["key"]
+        if 'kbps_data' in expected_types or 'kbps_data' in self.session_data_types:
+            record.kbps = self.last_session_data["kbps_data"]
+        record.input_string = self.last_session_data["input_string"]
+        record.correlation = correlation
+        record.key_quality = self.key_quality_results
+        self.enqueue({"type": "session_record", "value": record})
+        logging.debug(f"Queued {record}")
+
+    def current_file_position(self):
+        return self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'
 
-            if line.startswith("VISIBILITY_RATIO_IS:"):
-                value = float(line.split(':')[1])
-                self.data_queue.put({"type": "visibility", "value": value})
-                self.last_session_data["visibility"] = value
-                self.session_data_types.add("visibility")
-                logging.debug(f"Current file position after visibility: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+    def parse_and_queue(self, line: str):
+        try:
+            # Timestamp lines make up nearly every line of a session, so they skip the prefix lookup
+            if (self.spd1_values_mode or self.spd2_values_mode) and line.isdigit():
+                self.handle_timestamp(line)
                 return
+            if self.spd_block:
+                self.flush_spd_block()
 
-            if line.startswith("SPD1_QBER_VALUE_IS:"):
-                value = float(line.split(':')[1])
-                self.data_queue.put({"type": "qber", "value": value})
-                self.last_session_data["qber"] = value
-                self.session_data_types.add("qber")
-                logging.debug(f"Current file position after qber: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
-                return
+            prefix, _, value = line.partition(':')
+            handler = self.line_handlers.get(prefix)
+            if handler is not None:
+                handler(value)
 
-            if line.startswith("NUMBER_OF_RX_KEY_BITS_AFTER_PRIVACY_AMPLIFICATION_IS:"):
-                logging.debug(f"Current file position after key_bits_length: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
-                return
+        except Exception as e:
+            logging.error(f"Error parsing line '{line}': {e}")
 
-            if line.startswith("KEY_BITS:"):
-                key_match = re.match(r"KEY_BITS:([01]{128,})", line)
-                if key_match:
-                    key = key_match.group(1)
-                    self.data_queue.put({"type": "key", "value": key, "length": len(key)})
-                    self.last_session_data["key"] = key
-                    self.session_data_types.add("key")
-                    logging.debug(f"Queued key (length {len(key)}): {key[:40]}... for session {self.current_session}")
-                    logging.debug(f"Current file position after key: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+    def handle_timestamp(self, line: str):
+        count = self.spd1_count if self.spd1_values_mode else self.spd2_count
+        if count + len(self.spd_block) < self.spd_block_size:
+            self.spd_block.append(line)
+            if count + len(self.spd_block) == self.spd_block_size:
+                self.flush_spd_block()
+
+    def handle_timestamp_block(self, data: bytes):
+        # A whole run of newline separated timestamps, as sliced out of the file by MmapReader
+        if not (self.spd1_values_mode or self.spd2_values_mode):
+            return
+        self.flush_spd_block()
+        count = self.spd1_count if self.spd1_values_mode else self.spd2_count
+        timestamps = np.fromstring(data, dtype=np.int64, sep=" ")[:self.spd_block_size - count]
+        if len(timestamps):
+            self.queue_spd_block("timestamp_spd1" if self.spd1_values_mode else "timestamp_spd2", timestamps)
+
+    def flush_spd_block(self):
+        if not self.spd_block:
+            return
+        # One conversion per block instead of int() per timestamp
+        timestamps = np.fromstring(" ".join(self.spd_block), dtype=np.int64, sep=" ")
+        self.spd_block = []
+        self.queue_spd_block("timestamp_spd1" if self.spd1_values_mode else "timestamp_spd2", timestamps)
+
+    def queue_spd_block(self, data_type: str, timestamps: np.ndarray):
+        self.queue_data({"type": data_type, "value": timestamps})
+        previous = self.last_session_data[data_type]
+        self.last_session_data[data_type] = np.concatenate((previous, timestamps)) if len(previous) else timestamps
+        self.session_data_types.add(data_type)
+        if data_type == "timestamp_spd1":
+            self.spd1_count += len(timestamps)
+            count = self.spd1_count
+        else:
+            self.spd2_count += len(timestamps)
+            count = self.spd2_count
+        if count == self.spd_block_size:
+            logging.info(f"Completed queuing {count} {'SPD1' if data_type == 'timestamp_spd1' else 'SPD2'} timestamps for session {self.current_session}")
+
+    def handle_session_number(self, value: str):
+        new_session = int(value)
+        if new_session != self.current_session:
+            self.complete_session()
+            if not self.batch_sessions:
+                expected_types = {'timestamp_spd1', 'timestamp_spd2', 'spd1_decaystate', 'visibility', 'qber'}
+                if self.mode == "console":
+                    expected_types.add('input_string')
+                if new_session % 2 == 0:
+                    expected_types.add('key')
                 else:
-                    logging.error(f"Invalid key format: {line}")
-                return
-
-            if line.startswith("KEY_RATE_PER_SECOND_IS:"):
-                kbps = float(line.split(':')[1])
-                self.data_queue.put({"type": "kbps_data", "kbps": kbps})
-                self.last_session_data["kbps_data"] = kbps
-                self.session_data_types.add("kbps_data")
-                logging.debug(f"Queued kbps: {kbps} for session {self.current_session}")
-                logging.debug(f"Current file position after kbps: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
-                return
+                    expected_types.add('kbps_data')
+                missing_types = expected_types - self.session_data_types
+                if missing_types:
+                    logging.warning(f"Session {self.current_session} missing data types: {missing_types}")
+                    for data_type in missing_types:
+                        if self.current_session == -1:
+                            if data_type in ['timestamp_spd1', 'timestamp_spd2']:
+                                continue
+                            elif data_type == 'key':
+                                self.enqueue({"type": "key", "value": PLACEHOLDER_KEY, "length": len(PLACEHOLDER_KEY)})
+                                self.last_session_data["key"] = PLACEHOLDER_KEY
+                                logging.info(f"Initialized missing {data_type} to '{'0' * 128}' for session {self.current_session}")
+                            elif data_type == 'input_string' and self.mode == "console":
+                                self.enqueue({"type": "input_string", "value": "default_input"})
+                                self.last_session_data["input_string"] = "default_input"
+                                logging.info(f"Initialized missing {data_type} to 'default_input' for session {self.current_session}")
+                            elif data_type != 'input_string':
+                                self.enqueue({"type": data_type, "value" if data_type != "kbps_data" else "kbps": 0})
+                                self.last_session_data[data_type] = 0
+                                logging.info(f"Initialized missing {data_type} to 0 for session {self.current_session}")
+                        else:
+                            if data_type in ['timestamp_spd1', 'timestamp_spd2']:
+                                if len(self.last_session_data[data_type]):
+                                    self.enqueue({"type": data_type, "value": self.last_session_data[data_type]})
+                            elif self.last_session_data[data_type] is not None and data_type != 'input_string':
+                                if data_type == 'key':
+                                    self.enqueue({"type": data_type, "value": self.last_session_data[data_type], "length": len(self.last_session_data[data_type])})
+                                elif data_type == 'kbps_data':
+                                    self.enqueue({"type": data_type, "kbps": self.last_session_data[data_type]})
+                                else:
+                                    self.enqueue({"type": data_type, "value": self.last_session_data[data_type]})
+                            elif data_type == 'input_string' and self.mode == "console" and self.last_session_data['input_string'] is not None:
+                                self.enqueue({"type": "input_string", "value": self.last_session_data['input_string']})
+            self.pace_session(new_session)
+            self.current_session = new_session
+            self.session_offset = self.file.line_offset if self.mode == "file" and self.file is not None else None
+            self.spd1_values_mode = False
+            self.spd2_values_mode = False
+            self.spd1_count = 0
+            self.spd2_count = 0
+            self.session_data_types = set()
+            self.session_values = {}
+            self.session_completed = False
+            self.queue_data({"type": "session_number", "value": new_session, "time": new_session * SESSION_INTERVAL})
+            self.last_session_data["timestamp_spd1"] = EMPTY_TIMESTAMPS
+            self.last_session_data["timestamp_spd2"] = EMPTY_TIMESTAMPS
+            logging.debug(f"Current file position after session: {self.current_file_position()}")
+
+    def set_replay_speed(self, replay_speed: float):
+        self.replay_speed = replay_speed
+        self.replay_anchor = None
+
+    def pace_session(self, session: int):
+        # Holds each session back until its slot on the monotonic clock, SESSION_INTERVAL / replay_speed apart
+        if not self.replay_speed:
+            return
+        now = time.monotonic()
+        if self.replay_anchor is None or session < self.replay_anchor[1]:
+            self.replay_anchor = (now, session)
+            return
+        delay = self.replay_anchor[0] + (session - self.replay_anchor[1]) * SESSION_INTERVAL / self.replay_speed - now
+        if delay > 0:
+            self.stop_event.wait(delay)
+        elif delay < -1.0:
+            # Too far behind to catch up without a burst, so pace from here instead
+            self.replay_anchor = (now, session)
+
+    def handle_spd1_values(self, value: str):
+        self.spd1_values_mode = True
+        self.spd2_values_mode = False
+        self.spd1_count = 0
+        logging.debug(f"Current file position after SPD1_VALUES: {self.current_file_position()}")
 
-            if line.startswith("INPUT_STRING:") and self.mode == "console":
-                input_str = line.split(':', 1)[1]
-                self.data_queue.put({"type": "input_string", "value": input_str})
-                self.last_session_data["input_string"] = input_str
-                self.session_data_types.add("input_string")
-                logging.debug(f"Queued input string: {input_str} for session {self.current_session}")
-                logging.debug(f"Current file position after input_string: {self.file.tell() if self.mode == 'file' and self.file and not self.file.closed else 'N/A'}")
+    def handle_spd2_values(self, value: str):
+        self.spd1_values_mode = False
+        self.spd2_values_mode = True
+        self.spd2_count = 0
+        logging.debug(f"Current file position after SPD2_VALUES: {self.current_file_position()}")
+
+    def handle_spd1_decaystate(self, value: str):
+        value = float(value)
+        self.queue_data({"type": "spd1_decaystate", "value": value})
+        self.last_session_data["spd1_decaystate"] = value
+        self.record_statistic("spd1_decaystate", value)
+        self.session_data_types.add("spd1_decaystate")
+        logging.debug(f"Current file position after spd1_decaystate: {self.current_file_position()}")
+
+    def handle_visibility(self, value: str):
+        value = float(value)
+        self.queue_data({"type": "visibility", "value": value})
+        self.last_session_data["visibility"] = value
+        self.record_statistic("visibility", value)
+        self.session_data_types.add("visibility")
+        logging.debug(f"Current file position after visibility: {self.current_file_position()}")
+
+    def handle_qber(self, value: str):
+        value = float(value)
+        self.queue_data({"type": "qber", "value": value})
+        self.last_session_data["qber"] = value
+        self.record_statistic("qber", value)
+        self.session_data_types.add("qber")
+        logging.debug(f"Current file position after qber: {self.current_file_position()}")
+
+    def record_statistic(self, name: str, value: float):
+        self.session_values[name] = value
+        t = self.current_session * SESSION_INTERVAL
+        with self.stats_lock:
+            stats = self.stats.add(name, t, value)
+            now = time.monotonic()
+            if now < self.overlay_due.get(name, 0.0):
                 return
-
-        except Exception as e:
-            logging.error(f"Error parsing line '{line}': {e}")
+            self.overlay_due[name] = now + OVERLAY_INTERVAL
+            low, high = stats.quantiles.quantiles(OVERLAY_QUANTILES)
+            ewma = stats.ewmas[0].value
+        self.enqueue({"type": "overlay", "name": name, "value": (t, ewma, low, high)})
+
+    def statistics(self):
+        # Welford mean/std, EWMAs and windowed quantiles of each metric parsed so far, by metric name
+        with self.stats_lock:
+            return self.stats.summary()
+
+    def handle_key_bits_length(self, value: str):
+        logging.debug(f"Current file position after key_bits_length: {self.current_file_position()}")
+
+    def handle_key(self, value: str):
+        key_match = KEY_BITS_PATTERN.match(value)
+        if key_match:
+            # Packed as soon as it is parsed, so the '0'/'1' string is never queued or kept
+            key = PackedKey.from_text(key_match.group(1))
+            self.queue_data({"type": "key", "value": key, "length": len(key)})
+            self.last_session_data["key"] = key
+            self.key_quality.add(key)
+            self.key_quality_results = self.key_quality.results()
+            self.queue_data({"type": "key_quality", "value": self.key_quality_results})
+            if self.key_vault is not None:
+                self.key_vault.append(self.current_session, key)
+            self.session_data_types.add("key")
+            logging.debug(f"Queued key (length {len(key)}): {key.text(40)}... for session {self.current_session}")
+            logging.debug(f"Current file position after key: {self.current_file_position()}")
+        else:
+            logging.error(f"Invalid key format: KEY_BITS:{value}")
+
+    def handle_kbps(self, value: str):
+        kbps = float(value)
+        self.queue_data({"type": "kbps_data", "kbps": kbps})
+        self.last_session_data["kbps_data"] = kbps
+        self.record_statistic("kbps", kbps)
+        self.session_data_types.add("kbps_data")
+        logging.debug(f"Queued kbps: {kbps} for session {self.current_session}")
+        logging.debug(f"Current file position after kbps: {self.current_file_position()}")
+
+    def handle_input_string(self, value: str):
+        if self.mode != "console":
+            return
+        self.queue_data({"type": "input_string", "value": value})
+        self.last_session_data["input_string"] = value
+        self.session_data_types.add("input_string")
+        logging.debug(f"Queued input string: {value} for session {self.current_session}")
+        logging.debug(f"Current file position after input_string: {self.current_file_position()}")
 
     def stop(self):
+        # The reader thread closes its own file when it sees stop_event, so a read in progress never
+        # hits a closed handle and its descriptors are not reused while it still holds them
         if self.running:
             logging.info("Stopping data processor")
             self.running = False
             self.stop_event.set()
             if self.mode == "console" and self.process:
                 self.process.kill()
-                self.process = None
-            elif self.mode == "file" and self.file and not self.file.closed:
-                self.file_position = self.file.tell()
-                logging.debug(f"Saved file position: {self.file_position}")
-                self.file.close()
-                self.file = None
+            file = self.file
+            if file is not None:
+                file.interrupt()
             if self.thread:
-                self.thread.join(timeout=0.1)
+                self.thread.join(timeout=STOP_TIMEOUT)
+                if self.thread.is_alive():
+                    logging.warning(f"Reader thread did not stop within {STOP_TIMEOUT} s")
                 self.thread = None
+            logging.debug(f"Saved file position: {self.file_position}")
 
     def get_file_position(self):
         return self.file_position
 
+    def session_file_position(self, session: int, window_sessions: int = 0):
+        # Byte offset to start reading from so that `session` is reached with up to
+        # `window_sessions` earlier sessions replayed before it
+        if self.session_index is None or self.session_index.offset(session) is None:
+            return None
+        start_session = self.session_index.first_session_from(max(0, session - window_sessions))
+        return self.session_index.offset(start_session)
+
     def close(self):
         self.stop()
         if self.mode == "console" and self.process:
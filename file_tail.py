@@ -0,0 +1,161 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def open_inotify(directory: str):
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        inotify_fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if inotify_fd < 0:
+            return None
+        if libc.inotify_add_watch(inotify_fd, os.fsencode(directory), WATCH_MASK) < 0:
+            os.close(inotify_fd)
+            return None
+        return inotify_fd
+    except (OSError, AttributeError):
+        return None
+
+
+class FileTail:
+    # Follows a growing text file the way `tail -F` does. wait() blocks on inotify where the
+    # platform has it and otherwise polls with a backoff that resets whenever data arrives.
+    def __init__(self, path: str, stop_event: threading.Event = None, min_poll: float = 0.01, max_poll: float = 0.5):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.stop_event = stop_event or threading.Event()
+        self.min_poll = min_poll
+        self.max_poll = max_poll
+        self.poll_delay = min_poll
+        self.close_lock = threading.Lock()
+        self.file = open(path, "rb")
+        self.eof_mtime = None
+        self.line_offset = 0
+        self.wake_read, self.wake_write = os.pipe()
+        self.inotify_fd = open_inotify(os.path.dirname(os.path.abspath(path)))
+        if self.inotify_fd is None:
+            logging.info(f"inotify unavailable, polling {path} every {min_poll}-{max_poll} s")
+
+    @property
+    def closed(self):
+        return self.file.closed
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def seek(self, position: int):
+        if position > os.fstat(self.file.fileno()).st_size:
+            logging.warning(f"Position {position} is past the end of {self.path}, starting from the beginning")
+            position = 0
+        self.file.seek(position)
+
+    def readline(self):
+        self.line_offset = self.file.tell()
+        line = self.file.readline()
+        if not line:
+            self.eof_mtime = os.fstat(self.file.fileno()).st_mtime_ns
+            return ""
+        if not line.endswith(b"\n"):
+            # The writer is part way through this line, so leave it for the next read
+            self.file.seek(-len(line), os.SEEK_CUR)
+            return ""
+        self.poll_delay = self.min_poll
+        return line.decode()
+
+    def wait(self):
+        try:
+            if self.inotify_fd is not None:
+                self.wait_for_event()
+            else:
+                self.stop_event.wait(self.poll_delay)
+                self.poll_delay = min(self.poll_delay * 2, self.max_poll)
+            if not self.stop_event.is_set():
+                self.check_rotation()
+        except (OSError, ValueError) as e:
+            if not self.stop_event.is_set():
+                raise
+            logging.debug(f"Tail of {self.path} interrupted: {e}")
+
+    def wait_for_event(self):
+        while not self.stop_event.is_set():
+            ready, _, _ = select.select([self.inotify_fd, self.wake_read], [], [])
+            if self.wake_read in ready:
+                os.read(self.wake_read, 512)
+                return
+            if self.read_events():
+                return
+
+    def read_events(self):
+        relevant = False
+        try:
+            buffer = os.read(self.inotify_fd, 4096)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buffer):
+            _, _, _, name_length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset:offset + name_length].rstrip(b"\0").decode(errors="replace")
+            offset += name_length
+            if name == self.name:
+                relevant = True
+        return relevant
+
+    def check_rotation(self):
+        try:
+            on_disk = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        current = os.fstat(self.file.fileno())
+        if (on_disk.st_ino, on_disk.st_dev) != (current.st_ino, current.st_dev):
+            if self.file.tell() < current.st_size:
+                return  # Finish the old file before following the new one
+            logging.info(f"{self.path} was replaced, reopening from the beginning")
+            self.file.close()
+            self.file = open(self.path, "rb")
+        elif current.st_size < self.file.tell() or (current.st_size == self.file.tell() and current.st_mtime_ns != self.eof_mtime):
+            # A rewrite to exactly the old length only shows up as a newer mtime
+            logging.info(f"{self.path} was truncated, reading from the beginning")
+            self.file.seek(0)
+
+    def interrupt(self):
+        # Wakes a wait() blocked in select. Safe from any thread: the lock keeps close() from
+        # releasing the pipe, and its descriptor number being reused, while the byte is written.
+        with self.close_lock:
+            if self.wake_write is None:
+                return
+            try:
+                os.write(self.wake_write, b"\0")
+            except OSError:
+                pass
+
+    def close(self):
+        # Only the thread that reads from the tail closes it, other threads interrupt() it
+        with self.close_lock:
+            if self.wake_write is None:
+                return
+            self.file.close()
+            if self.inotify_fd is not None:
+                os.close(self.inotify_fd)
+                self.inotify_fd = None
+            os.close(self.wake_read)
+            os.close(self.wake_write)
+            self.wake_read = self.wake_write = None
@@ -6722,42 +6722,295 @@ import sys
 import numpy as np
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
-    QSpacerItem, QLabel, QTabWidget, QGridLayout, QSizePolicy, QStatusBar, QLineEdit
+    QSpacerItem, QLabel, QTabWidget, QGridLayout, QSizePolicy, QStatusBar, QLineEdit, QComboBox
 )
 from PyQt6.QtCore import QTimer, Qt
-from queue import Queue, Empty
+from queue import Queue
 import pyqtgraph as pg
-import time
 import logging
-from data_processor import DataProcessor
+from data_processor import DataProcessor, SESSION_INTERVAL
+from aggregator import Aggregator
+from render_worker import RenderWorker, FRAME_INTERVAL, IDLE_INTERVAL
+from key_quality import MIN_TEST_BITS, SIGNIFICANCE_LEVEL
 import math
 
+TICK_STEPS = (5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200, 86400)
+# Spans the line graphs can show beyond the live window, served from the history pyramid
+VIEW_SPANS = (("10 min", 600), ("1 h", 3600), ("6 h", 6 * 3600), ("24 h", 24 * 3600), ("7 d", 7 * 24 * 3600))
+MAX_LABELLED_BINS = 64
+SYMBOL_POINT_LIMIT = 500
+DEFAULT_PLOT_COLUMNS = 1000
+IDLE_FRAMES = 10  # Frames without a snapshot before the timer drops to IDLE_INTERVAL
+LAG_DISPLAY_MIN = 0.05  # Seconds of queued work before the status bar shows the lag
+ALARM_HISTORY_LINES = 10  # Recent alarm events listed in the banner's tooltip
+TOOLTIP_RADIUS = 0.5  # Distance in plot units within which a point gets a tooltip
+
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def qber_axis(qber_min, qber_max):
+    # y-axis range and tick interval from the min and max of the data in the plot window
+    if qber_min is None:
+        return 0, 20, 2
+    qber_range = qber_max - qber_min
+    margin = qber_range * 0.1 if qber_range > 0 else 2.0
+    qber_lower = max(0, qber_min - margin)
+    qber_upper = qber_max + margin
+    tick_interval = max(2.0, math.ceil((qber_upper - qber_lower) / 10))
+    return qber_lower, qber_upper, tick_interval
+
+def visibility_axis(vis_min, vis_max):
+    if vis_min is None:
+        return 0, 1, 0.2
+    vis_range = vis_max - vis_min
+    margin = vis_range * 0.1 if vis_range > 0 else 0.05
+    vis_lower = max(0, vis_min - margin)
+    vis_upper = vis_max + margin
+    tick_interval = max(0.1, round((vis_upper - vis_lower) / 10, 1))
+    return vis_lower, vis_upper, tick_interval
+
+def tick_step_for(span):
+    # Aim for about a dozen time-axis ticks however long the span is
+    return next((step for step in TICK_STEPS if span / step <= 12), TICK_STEPS[-1])
+
+class HistogramView:
+    # Bars and per-bin count labels for a HistogramModel on one plot, drawn from its snapshots. Only
+    # the labels of bins whose count differs from the last snapshot drawn are redrawn, and views
+    # on a hidden tab only note that they are stale and catch up once their tab is shown. Histograms wider
+    # than MAX_LABELLED_BINS are drawn as one filled step curve without labels, since thousands of
+    # bar and text items are too slow to repaint. With log_counts the heights are log10(1 + count).
+    def __init__(self, plot_widget, model, brush, log_counts=False):
+        self.plot_widget = plot_widget
+        self.brush = brush
+        self.log_counts = log_counts
+        self.label_offset = 0.02 if log_counts else 0.5
+        self.min_top = 1 if log_counts else 10
+        self.stale = False
+        self.labels = []
+        self.shown_counts = None
+        heights = self.heights(model)
+        if model.bins <= MAX_LABELLED_BINS:
+            self.bar = pg.BarGraphItem(x0=model.edges[:-1], height=heights, width=model.bin_width, brush=brush)
+            plot_widget.addItem(self.bar)
+            for center, height in zip(model.centers, heights):
+                label = pg.TextItem(text="0", color='#E0F7FA', anchor=(0.5, 1.0))
+                label.setPos(center, height + self.label_offset)
+                plot_widget.addItem(label)
+                self.labels.append(label)
+        else:
+            self.bar = pg.PlotDataItem(model.edges, heights, stepMode='center', fillLevel=0, brush=brush, pen=pg.mkPen(brush))
+            plot_widget.addItem(self.bar)
+        model.subscribe(self)
+
+    def heights(self, model):
+        return np.log10(1 + model.counts) if self.log_counts else model.counts
+
+    def refresh(self, model, frame):
+        if not self.plot_widget.isVisible():
+            self.stale = True
+            return
+        self.stale = False
+        heights = self.heights(model)
+        if self.labels:
+            self.bar.setOpts(height=heights, brush=self.brush)
+            if self.shown_counts is None:
+                partitions = range(model.bins)
+            else:
+                partitions = np.flatnonzero(model.counts != self.shown_counts).tolist()
+            for partition in partitions:
+                self.labels[partition].setText(str(int(model.counts[partition])))
+                self.labels[partition].setPos(model.centers[partition], heights[partition] + self.label_offset)
+        else:
+            self.bar.setData(model.edges, heights)
+        self.shown_counts = model.counts
+        self.plot_widget.setYRange(0, max(heights.max() * 1.2, self.min_top))
+
+    def reset(self, model):
+        self.shown_counts = None
+        self.refresh(model, None)
+
+class CorrelationView(HistogramView):
+    # Delay histogram of a CorrelationModel, titled with its coincidence counts
+    def refresh(self, model, frame):
+        super().refresh(model, frame)
+        if not self.stale:
+            self.plot_widget.setTitle(f"SPD1/SPD2 Cross-Correlation | Coincidences within {model.window} ps: "
+                                      f"{model.coincidences} total, {model.session_coincidences} last session", color='#E0F7FA', size='14pt')
+
+class LineView:
+    # Line and markers for a SeriesModel on one plot, drawn from its snapshots. y_axis picks the y
+    # range from the data, without it the range set at reset is kept. The samples in view are
+    # decimated to a min and max per pixel column before setData, markers are dropped above
+    # SYMBOL_POINT_LIMIT points. A zoom or pan redraws the new range, and the overlays on the same
+    # plot, once control returns to the event loop: from snapshots of that range requested from
+    # `source` (RenderWorker.request_view), drawn when they arrive, or from the last frame's
+    # snapshot without one.
+    def __init__(self, plot_widget, model, color, y_label, y_range, y_ticks, y_axis=None, plot_window=60.0, tick_step=5, source=None):
+        self.plot_widget = plot_widget
+        self.model = model
+        self.source = source
+        self.overlays = []
+        self.series = None  # Last snapshot drawn
+        self.y_label = y_label
+        self.y_range = y_range
+        self.y_ticks = y_ticks
+        self.y_axis = y_axis
+        self.plot_window = plot_window
+        self.tick_step = tick_step
+        self.stale = False
+        # Last axis state handed to pyqtgraph, so unchanged ticks are not rebuilt every frame
+        self.x_ticks = None
+        self.y_key = None
+        self.symbols = True
+        self.setting_range = False
+        self.redraw_pending = False
+        self.line = plot_widget.plot([], [], pen=pg.mkPen(color, width=2), symbol='o', symbolBrush=color, symbolSize=8)
+        plot_widget.getViewBox().sigXRangeChanged.connect(self.range_changed)
+        model.subscribe(self)
+
+    def draw(self, series, x_min, x_max):
+        self.series = series
+        columns = self.plot_widget.getViewBox().width() or DEFAULT_PLOT_COLUMNS
+        x_data, y_data = series.view(x_min, x_max, columns)
+        symbols = len(x_data) <= SYMBOL_POINT_LIMIT
+        if symbols != self.symbols:
+            self.line.setSymbol('o' if symbols else None)
+            self.symbols = symbols
+        self.line.setData(x_data, y_data)
+
+    def range_changed(self, viewbox, x_range):
+        if self.setting_range or self.redraw_pending:
+            return
+        self.redraw_pending = True
+        QTimer.singleShot(0, self.redraw_view_range)
+
+    def redraw_view_range(self):
+        self.redraw_pending = False
+        if self.series is None or not self.plot_widget.isVisible():
+            return
+        x_min, x_max = self.plot_widget.getViewBox().viewRange()[0]
+        if self.source is None:
+            self.draw(self.series, x_min, x_max)
+            return
+        columns = self.plot_widget.getViewBox().width() or DEFAULT_PLOT_COLUMNS
+        views = self.source(self, [self.model] + [overlay.model for overlay in self.overlays], x_min, x_max, columns)
+        if views is not None:
+            self.draw_view_range(views)
+        else:
+            # The worker is mid-pass: the last frame's snapshot stands in until its snapshots arrive
+            self.draw(self.series, x_min, x_max)
+
+    def draw_view_range(self, views):
+        (x_min, x_max), snapshots = views
+        if not self.plot_widget.isVisible():
+            return
+        self.draw(snapshots[0], x_min, x_max)
+        for overlay, snapshot in zip(self.overlays, snapshots[1:]):
+            overlay.refresh(snapshot, None)
+
+    def refresh(self, model, frame):
+        if not self.plot_widget.isVisible():
+            self.stale = True
+            return
+        self.stale = False
+        x_min, current_time, x_ticks = frame
+        self.draw(model, x_min, current_time)
+        self.setting_range = True
+        self.plot_widget.setXRange(x_min, current_time)
+        self.setting_range = False
+        if x_ticks is not self.x_ticks:
+            self.plot_widget.getAxis('bottom').setTicks([x_ticks])
+            self.x_ticks = x_ticks
+        if self.y_axis is not None:
+            lower, upper, tick_interval = self.y_axis(model.min(), model.max())
+            y_key = (round(lower, 2), round(upper, 2), tick_interval)
+            if y_key != self.y_key:
+                ticks = [lower + i * tick_interval for i in range(int((upper - lower) / tick_interval) + 1)]
+                self.plot_widget.setYRange(lower, upper)
+                self.plot_widget.getAxis('left').setTicks([[(val, f"{val:.2f}") for val in ticks]])
+                self.y_key = y_key
+
+    def reset(self, model):
+        self.stale = False
+        self.x_ticks = None
+        self.y_key = None
+        x_ticks = [(i, str(i)) for i in range(0, int(self.plot_window) + 1, self.tick_step)]
+        self.setting_range = True
+        self.draw(model, 0, self.plot_window)
+        self.plot_widget.setXRange(0, self.plot_window)
+        self.setting_range = False
+        self.plot_widget.getAxis('bottom').setTicks([x_ticks])
+        self.plot_widget.setYRange(*self.y_range)
+        self.plot_widget.getAxis('left').setTicks([self.y_ticks])
+        self.plot_widget.tooltip.hide()
+
+class OverlayView:
+    # A thin line drawn over a LineView from one of the aggregator's overlay models, such as a
+    # metric's EWMA. It leaves the axes to the LineView, which also redraws it for a zoomed or
+    # panned range, and pyqtgraph clips and downsamples it to the visible range.
+    def __init__(self, plot_widget, model, pen, line_view):
+        self.plot_widget = plot_widget
+        self.model = model
+        self.stale = False
+        line_view.overlays.append(self)
+        self.curve = plot_widget.plot([], [], pen=pen)
+        self.curve.setClipToView(True)
+        self.curve.setDownsampling(auto=True, method='peak')
+        model.subscribe(self)
+
+    def refresh(self, series, frame):
+        if not self.plot_widget.isVisible():
+            self.stale = True
+            return
+        self.stale = False
+        self.curve.setData(series.x, series.y)
+
+    def reset(self, series):
+        self.stale = False
+        self.curve.setData(series.x, series.y)
+
 class MainWindow(QWidget):
-    def __init__(self, data_queue, processor):
+    def __init__(self, data_queue, processor, plot_window=60.0, histogram_options=None, correlation_options=None):
         super().__init__()
         self.setObjectName("mainWindow")
         self.data_queue = data_queue
         self.processor = processor
-        self.start_time = time.time()
+        self.processor_options = {
+            "batch_sessions": processor.batch_sessions,
+            "spd_block_size": processor.spd_block_size,
+            "mmap_replay": processor.mmap_replay,
+            "index_sessions": processor.index_sessions,
+            "replay_speed": processor.replay_speed,
+            "key_vault": processor.key_vault,
+            "alarm_engine": processor.alarm_engine,
+            "correlation_options": processor.correlation_options,
+            "stats_window": processor.stats_window
+        }
+        self.alarm_engine = processor.alarm_engine
+        self.alarm_version = -1
+        self.plot_window = plot_window
+        # bins, bin_width, start and period of the SPD histograms (see HistogramModel) and log_counts
+        self.histogram_options = {"bins": 40, "bin_width": 100, "start": 0, "period": None, "log_counts": False}
+        self.histogram_options.update(histogram_options or {})
+        self.view_span = plot_window
+        self.tick_step = tick_step_for(plot_window)
+        histogram_bins = {name: value for name, value in self.histogram_options.items() if name != "log_counts"}
+        self.aggregator = Aggregator(plot_window, histogram_bins, correlation_options)
+        self.worker = RenderWorker(self.data_queue, self.aggregator, plot_window)
+        # State of the last snapshot drawn, and the last snapshot of each model for stale views
+        self.session_time = 0.0
         self.current_session = -1
+        self.lag = 0.0
+        self.latest_plots = {}
+        self.idle_frames = 0
         self.file_position = 0
-        self.session_data_types = set()
+        self.x_key = None
+        self.x_ticks = None
         self.mode = self.processor.mode
-        self.last_session_data = {
-            "timestamp_spd1": [],
-            "timestamp_spd2": [],
-            "spd1_decaystate": None,
-            "visibility": None,
-            "qber": None,
-            "key": None,
-            "kbps_data": None
-        }
         self.init_ui()
         self.setup_plots()
         self.setup_timer()
         self.setup_marquee()
+        self.worker.start()
 
     def init_ui(self):
         self.setWindowTitle("Quantum Key Distribution Analyzer")
@@ -6845,6 +7098,13 @@ class MainWindow(QWidget):
                 background: #263238;
                 border-radius: 6px;
             }
+            QLabel#alarmBanner {
+                color: #FFFFFF;
+                background: #C62828;
+                font-weight: bold;
+                padding: 4px 8px;
+                border-radius: 4px;
+            }
             QLineEdit#inputField {
                 background: #263238;
                 color: #E0F7FA;
@@ -6853,6 +7113,14 @@ class MainWindow(QWidget):
                 padding: 8px;
                 font-size: 14px;
             }
+            QComboBox#speedBox, QComboBox#spanBox {
+                background: #263238;
+                color: #E0F7FA;
+                border: 1px solid #4DD0E1;
+                border-radius: 6px;
+                padding: 8px;
+                font-size: 14px;
+            }
             QWidget#marqueeContainer, QWidget#buttonContainer, QWidget#keyContainer {
                 background: #263238;
                 border: 1px solid #4DD0E1;
@@ -6880,6 +7148,7 @@ class MainWindow(QWidget):
 
         tab_widget = QTabWidget()
         tab_widget.setStyleSheet("QTabWidget { margin: 10px; }")
+        self.tab_widget = tab_widget
 
         all_tab = QWidget()
         all_layout = QVBoxLayout()
@@ -6937,6 +7206,16 @@ class MainWindow(QWidget):
         hist2_tab.setLayout(hist2_tab_layout)
         tab_widget.addTab(hist2_tab, "SPD2 Histogram")
 
+        correlation_tab = QWidget()
+        correlation_tab_layout = QHBoxLayout()
+        correlation_tab_layout.addStretch()
+        self.correlation_plot_tab = pg.PlotWidget(title="SPD1/SPD2 Cross-Correlation", objectName="correlationPlot")
+        self.correlation_plot_tab.setFixedSize(700, 400)
+        correlation_tab_layout.addWidget(self.correlation_plot_tab)
+        correlation_tab_layout.addStretch()
+        correlation_tab.setLayout(correlation_tab_layout)
+        tab_widget.addTab(correlation_tab, "Correlation")
+
         qber_tab = QWidget()
         qber_tab_layout = QHBoxLayout()
         qber_tab_layout.addStretch()
@@ -6985,6 +7264,8 @@ class MainWindow(QWidget):
         self.key_display = QLabel("Key (None): None", objectName="keyDisplay")
         self.key_display.setToolTip("Full key available on hover")
         key_layout.addWidget(self.key_display)
+        self.key_quality_label = QLabel("Key quality: no keys yet", objectName="keyDisplay")
+        key_layout.addWidget(self.key_quality_label)
         key_layout.addStretch()
         key_container.setLayout(key_layout)
         main_layout.addWidget(key_container)
@@ -7013,11 +7294,41 @@ class MainWindow(QWidget):
         self.mode_button.clicked.connect(self.toggle_mode)
         self.resume_button.setEnabled(False)
         self.resume_button.setVisible(self.mode == "file")
+        self.session_field = QLineEdit()
+        self.session_field.setObjectName("inputField")
+        self.session_field.setPlaceholderText("Session")
+        self.session_field.setMaximumWidth(120)
+        self.session_field.setVisible(self.mode == "file")
+        self.session_field.returnPressed.connect(self.seek_to_session)
+        self.seek_button = QPushButton("Seek")
+        self.seek_button.setObjectName("seekButton")
+        self.seek_button.clicked.connect(self.seek_to_session)
+        self.seek_button.setVisible(self.mode == "file")
+        self.speed_box = QComboBox()
+        self.speed_box.setObjectName("speedBox")
+        for label, speed in (("Speed: Max", None), ("Speed: 1x", 1.0), ("Speed: 10x", 10.0), ("Speed: 100x", 100.0)):
+            self.speed_box.addItem(label, speed)
+        if self.speed_box.findData(self.processor.replay_speed) == -1:
+            self.speed_box.addItem(f"Speed: {self.processor.replay_speed:g}x", self.processor.replay_speed)
+        self.speed_box.setCurrentIndex(self.speed_box.findData(self.processor.replay_speed))
+        self.speed_box.currentIndexChanged.connect(self.change_replay_speed)
+        self.speed_box.setVisible(self.mode == "file")
+        self.span_box = QComboBox()
+        self.span_box.setObjectName("spanBox")
+        self.span_box.addItem(f"Span: {self.plot_window:g} s", self.plot_window)
+        for label, span in VIEW_SPANS:
+            if span > self.plot_window:
+                self.span_box.addItem(f"Span: {label}", span)
+        self.span_box.currentIndexChanged.connect(self.change_view_span)
         button_layout.addWidget(self.input_label)
         button_layout.addWidget(self.input_field)
         button_layout.addWidget(self.start_button)
         button_layout.addWidget(self.stop_button)
         button_layout.addWidget(self.resume_button)
+        button_layout.addWidget(self.session_field)
+        button_layout.addWidget(self.seek_button)
+        button_layout.addWidget(self.speed_box)
+        button_layout.addWidget(self.span_box)
         button_layout.addWidget(self.mode_button)
         button_layout.addStretch()
         button_container.setLayout(button_layout)
@@ -7025,6 +7336,9 @@ class MainWindow(QWidget):
 
         self.status_bar = QStatusBar()
         self.status_bar.showMessage(f"Mode: {self.mode.capitalize()} | Session: None")
+        self.alarm_banner = QLabel("", objectName="alarmBanner")
+        self.alarm_banner.hide()
+        self.status_bar.addPermanentWidget(self.alarm_banner)
         main_layout.addWidget(self.status_bar)
 
         self.setLayout(main_layout)
@@ -7034,116 +7348,83 @@ class MainWindow(QWidget):
         self.timer.stop()
         self.mode = "file" if self.mode == "console" else "console"
         self.file_position = 0
-        self.current_session = -1
-        self.session_data_types = set()
-        self.last_session_data = {
-            "timestamp_spd1": [],
-            "timestamp_spd2": [],
-            "spd1_decaystate": None,
-            "visibility": None,
-            "qber": None,
-            "key": None,
-            "kbps_data": None
-        }
         input_string = self.input_field.text() or "default_input" if self.mode == "console" else None
-        self.processor = DataProcessor(self.data_queue, mode=self.mode, file_position=self.file_position, input_string=input_string)
+        self.processor = DataProcessor(self.data_queue, mode=self.mode, file_position=self.file_position, input_string=input_string, **self.processor_options)
         self.mode_button.setText(f"Mode: {self.mode.capitalize()}")
         self.status_bar.showMessage(f"Mode: {self.mode.capitalize()} | Session: None")
         self.resume_button.setEnabled(False)
         self.resume_button.setVisible(self.mode == "file")
+        self.session_field.setVisible(self.mode == "file")
+        self.seek_button.setVisible(self.mode == "file")
+        self.speed_box.setVisible(self.mode == "file")
         self.input_label.setVisible(self.mode == "console")
         self.input_field.setVisible(self.mode == "console")
         self.key_display.setText(f"Key (None): None")
-        self.hist_data_all.fill(0)
-        self.hist_data_tab.fill(0)
-        self.hist2_data_all.fill(0)
-        self.hist2_data_tab.fill(0)
-        self.hist_bar_all.setOpts(height=self.hist_data_all, brush='#FF6F61')
-        self.hist_bar_tab.setOpts(height=self.hist_data_tab, brush='#FF6F61')
-        self.hist2_bar_all.setOpts(height=self.hist2_data_all, brush='#FFCA28')
-        self.hist2_bar_tab.setOpts(height=self.hist2_data_tab, brush='#FFCA28')
-        bar_centers = np.arange(40)*100 + 50
-        for i in range(40):
-            self.hist_labels_all[i].setText("0")
-            self.hist_labels_all[i].setPos(bar_centers[i], self.hist_data_all[i] + 0.5)
-            self.hist_labels_tab[i].setText("0")
-            self.hist_labels_tab[i].setPos(bar_centers[i], self.hist_data_tab[i] + 0.5)
-            self.hist2_labels_all[i].setText("0")
-            self.hist2_labels_all[i].setPos(bar_centers[i], self.hist2_data_all[i] + 0.5)
-            self.hist2_labels_tab[i].setText("0")
-            self.hist2_labels_tab[i].setPos(bar_centers[i], self.hist2_data_tab[i] + 0.5)
-        self.hist_plot_all.setYRange(0, 10)
-        self.hist_plot_tab.setYRange(0, 10)
-        self.hist2_plot_all.setYRange(0, 10)
-        self.hist2_plot_tab.setYRange(0, 10)
-        x_ticks = [(i, str(i)) for i in range(0, 61, 5)]
-        self.qber_x_all.clear()
-        self.qber_y_all.clear()
-        self.qber_x_tab.clear()
-        self.qber_y_tab.clear()
-        self.qber_line_all.setData([], [])
-        self.qber_line_tab.setData([], [])
-        self.qber_plot_all.setXRange(0, 60)
-        self.qber_plot_all.getAxis('bottom').setTicks([x_ticks])
-        self.qber_plot_all.setYRange(0, 20)
-        self.qber_plot_all.getAxis('left').setTicks([[(i, f"{i:.0f}") for i in range(0, 21, 2)]])
-        self.qber_plot_tab.setXRange(0, 60)
-        self.qber_plot_tab.getAxis('bottom').setTicks([x_ticks])
-        self.qber_plot_tab.setYRange(0, 20)
-        self.qber_plot_tab.getAxis('left').setTicks([[(i, f"{i:.0f}") for i in range(0, 21, 2)]])
-        self.kbps_x_all.clear()
-        self.kbps_y_all.clear()
-        self.kbps_x_tab.clear()
-        self.kbps_y_tab.clear()
-        self.kbps_line_all.setData([], [])
-        self.kbps_line_tab.setData([], [])
-        self.kbps_plot_all.setXRange(0, 60)
-        self.kbps_plot_all.getAxis('bottom').setTicks([x_ticks])
-        self.kbps_plot_all.setYRange(0, 10)
-        self.kbps_plot_all.getAxis('left').setTicks([[(i, f"{i:.0f}") for i in range(0, 11, 2)]])
-        self.kbps_plot_tab.setXRange(0, 60)
-        self.kbps_plot_tab.getAxis('bottom').setTicks([x_ticks])
-        self.kbps_plot_tab.setYRange(0, 10)
-        self.kbps_plot_tab.getAxis('left').setTicks([[(i, f"{i:.0f}") for i in range(0, 11, 2)]])
-        self.visibility_x_all.clear()
-        self.visibility_y_all.clear()
-        self.visibility_x_tab.clear()
-        self.visibility_y_tab.clear()
-        self.visibility_line_all.setData([], [])
-        self.visibility_line_tab.setData([], [])
-        self.visibility_plot_all.setXRange(0, 60)
-        self.visibility_plot_all.getAxis('bottom').setTicks([x_ticks])
-        self.visibility_plot_all.setYRange(0, 1)
-        self.visibility_plot_all.getAxis('left').setTicks([[(i/10, f"{i/10:.1f}") for i in range(0, 11, 2)]])
-        self.visibility_plot_tab.setXRange(0, 60)
-        self.visibility_plot_tab.getAxis('bottom').setTicks([x_ticks])
-        self.visibility_plot_tab.setYRange(0, 1)
-        self.visibility_plot_tab.getAxis('left').setTicks([[(i/10, f"{i/10:.1f}") for i in range(0, 11, 2)]])
-        self.spd1_x_all.clear()
-        self.spd1_y_all.clear()
-        self.spd1_x_tab.clear()
-        self.spd1_y_tab.clear()
-        self.spd1_line_all.setData([], [])
-        self.spd1_line_tab.setData([], [])
-        self.spd1_plot_all.setXRange(0, 60)
-        self.spd1_plot_all.getAxis('bottom').setTicks([x_ticks])
-        self.spd1_plot_all.setYRange(0, 1)
-        self.spd1_plot_all.getAxis('left').setTicks([[(i/10, f"{i/10:.1f}") for i in range(0, 11, 2)]])
-        self.spd1_plot_tab.setXRange(0, 60)
-        self.spd1_plot_tab.getAxis('bottom').setTicks([x_ticks])
-        self.spd1_plot_tab.setYRange(0, 1)
-        self.spd1_plot_tab.getAxis('left').setTicks([[(i/10, f"{i/10:.1f}") for i in range(0, 11, 2)]])
-        self.qber_plot_all.tooltip.hide()
-        self.qber_plot_tab.tooltip.hide()
-        self.kbps_plot_all.tooltip.hide()
-        self.kbps_plot_tab.tooltip.hide()
-        self.visibility_plot_all.tooltip.hide()
-        self.visibility_plot_tab.tooltip.hide()
-        self.spd1_plot_all.tooltip.hide()
-        self.spd1_plot_tab.tooltip.hide()
+        self.reset_plots()
         logging.info(f"Switched to {self.mode} mode")
         logging.debug("Reset all histogram and line graph data, including axis configurations")
 
+    def show_status(self):
+        message = f"Mode: {self.mode.capitalize()} | Session: {self.current_session}"
+        dropped = getattr(self.data_queue, "dropped", 0)
+        coalesced = getattr(self.data_queue, "coalesced", 0)
+        if dropped or coalesced:
+            message += f" | Queue: {self.data_queue.qsize()} pending, {dropped} dropped, {coalesced} coalesced"
+            trimmed = getattr(self.data_queue, "trimmed_timestamps", 0)
+            if trimmed:
+                message += f", {trimmed} timestamps trimmed"
+        if self.lag >= LAG_DISPLAY_MIN:
+            message += f" | Lag: {self.lag:.2f} s"
+        self.status_bar.showMessage(message)
+
+    def show_lag(self):
+        # Polled every tick, so the lag keeps counting up during a stall when no snapshots arrive
+        lag = self.worker.current_lag()
+        if (lag >= LAG_DISPLAY_MIN or self.lag >= LAG_DISPLAY_MIN) and f"{lag:.2f}" != f"{self.lag:.2f}":
+            self.lag = lag
+            self.show_status()
+        else:
+            self.lag = lag
+
+    def show_alarms(self):
+        # Polled from the processor's AlarmEngine every tick rather than carried in snapshots, so a
+        # banner goes up as soon as a session raises it, however far the plots are behind
+        engine = self.alarm_engine
+        if engine is None or engine.version == self.alarm_version:
+            return
+        self.alarm_version = engine.version
+        active = engine.active()
+        if not active:
+            self.alarm_banner.hide()
+            return
+        self.alarm_banner.setText("ALARM: " + " | ".join(f"{event.detail} (since session {event.session})" for event in active))
+        history = engine.recent_events()[-ALARM_HISTORY_LINES:]
+        self.alarm_banner.setToolTip("\n".join(f"Session {event.session}: {event.rule} {event.state}, {event.metric}={event.value:g}" for event in history))
+        self.alarm_banner.show()
+
+    def show_key_quality(self, results):
+        if "monobit_p" not in results:
+            self.key_quality_label.setText(f"Key quality: {results['bits']} of {MIN_TEST_BITS} bits needed")
+            return
+        tests = (("monobit", results["monobit_p"]), ("runs", results["runs_p"]), ("block", results["block_frequency_p"]))
+        parts = [f"{name} p={p:.3f}" + (" FAIL" if p < SIGNIFICANCE_LEVEL else "") for name, p in tests if p is not None]
+        if results["serial_correlation"] is not None:
+            parts.append(f"serial r={results['serial_correlation']:+.4f}")
+        self.key_quality_label.setText(f"Key quality ({results['keys']} keys, {results['bits']} bits): " + " | ".join(parts))
+
+    def change_replay_speed(self, index):
+        replay_speed = self.speed_box.itemData(index)
+        self.processor_options["replay_speed"] = replay_speed
+        self.processor.set_replay_speed(replay_speed)
+        logging.info(f"Replay speed set to {replay_speed or 'max'}")
+
+    def change_view_span(self, index):
+        self.view_span = self.span_box.itemData(index)
+        self.tick_step = tick_step_for(self.view_span)
+        self.x_key = None
+        self.render_frame(self.worker.set_view_span(self.view_span))
+        logging.info(f"Line graphs now span {self.view_span:g} s")
+
     def setup_marquee(self):
         self.marquee_timer = QTimer(self)
         self.marquee_timer.setInterval(100)
@@ -7158,476 +7439,223 @@ class MainWindow(QWidget):
     def setup_plots(self):
         pg.setConfigOptions(antialias=True)
 
-        def configure_line_plot(plot_widget, y_label, title, x_range=(0, 60), y_range=None):
+        def configure_line_plot(plot_widget, y_label, title, y_range=None):
             plot_widget.setLabel('bottom', 'Time (s)', color='#E0F7FA', size='12pt')
             plot_widget.setLabel('left', y_label, color='#E0F7FA', size='12pt')
             plot_widget.showGrid(x=True, y=True, alpha=0.3)
             plot_widget.getAxis('bottom').setTextPen('#E0F7FA')
             plot_widget.getAxis('left').setTextPen('#E0F7FA')
             plot_widget.setTitle(title, color='#E0F7FA', size='14pt')
-            plot_widget.setXRange(*x_range)
+            plot_widget.setXRange(0, self.plot_window)
             if y_range:
                 plot_widget.setYRange(*y_range)
-            plot_widget.getAxis('bottom').setTicks([[(i, str(i)) for i in range(0, 61, 5)]])
+            plot_widget.getAxis('bottom').setTicks([[(i, str(i)) for i in range(0, int(self.plot_window) + 1, self.tick_step)]])
             plot_widget.tooltip = pg.TextItem(text="", anchor=(0, 0), color='#E0F7FA')
             plot_widget.addItem(plot_widget.tooltip)
             plot_widget.tooltip.hide()
-            plot_widget.getPlotItem().scene().sigMouseMoved.connect(lambda pos: self.on_mouse_moved(plot_widget, pos))
+            # Mouse moves are coalesced to one lookup per frame
+            plot_widget.mouse_proxy = pg.SignalProxy(plot_widget.getPlotItem().scene().sigMouseMoved, rateLimit=int(1 / FRAME_INTERVAL),
+                                                     slot=lambda event, plot_widget=plot_widget: self.on_mouse_moved(plot_widget, event[0]))
 
-        def configure_histogram_plot(plot_widget, title, brush_color, x_range=(0, 4000)):
+        def configure_histogram_plot(plot_widget, title, brush_color, x_range=(0, 4000), log_counts=False):
             plot_widget.setLabel('bottom', 'Time (ps)', color='#E0F7FA', size='12pt')
-            plot_widget.setLabel('left', 'Count', color='#E0F7FA', size='12pt')
+            plot_widget.setLabel('left', 'log10(1 + Count)' if log_counts else 'Count', color='#E0F7FA', size='12pt')
             plot_widget.showGrid(x=True, y=True, alpha=0.3)
             plot_widget.getAxis('bottom').setTextPen('#E0F7FA')
             plot_widget.getAxis('left').setTextPen('#E0F7FA')
             plot_widget.setTitle(title, color='#E0F7FA', size='14pt')
             plot_widget.setXRange(*x_range)
 
-        self.hist_data_all = np.zeros(40)
-        self.hist_bar_all = pg.BarGraphItem(x0=np.arange(40)*100, height=self.hist_data_all, width=100, brush='#FF6F61')
-        self.hist_plot_all.addItem(self.hist_bar_all)
-        configure_histogram_plot(self.hist_plot_all, "Timestamp Histogram (SPD1)", '#FF6F61')
-        self.hist_labels_all = []
-        bar_centers = np.arange(40)*100 + 50
-        for i in range(40):
-            label = pg.TextItem(text="0", color='#E0F7FA', anchor=(0.5, 1.0))
-            label.setPos(bar_centers[i], self.hist_data_all[i] + 0.5)
-            self.hist_plot_all.addItem(label)
-            self.hist_labels_all.append(label)
-
-        self.hist2_data_all = np.zeros(40)
-        self.hist2_bar_all = pg.BarGraphItem(x0=np.arange(40)*100, height=self.hist2_data_all, width=100, brush='#FFCA28')
-        self.hist2_plot_all.addItem(self.hist2_bar_all)
-        configure_histogram_plot(self.hist2_plot_all, "Timestamp Histogram (SPD2)", '#FFCA28')
-        self.hist2_labels_all = []
-        for i in range(40):
-            label = pg.TextItem(text="0", color='#E0F7FA', anchor=(0.5, 1.0))
-            label.setPos(bar_centers[i], self.hist2_data_all[i] + 0.5)
-            self.hist2_plot_all.addItem(label)
-            self.hist2_labels_all.append(label)
+        # One model per metric, owned by the aggregator. The "all" and tab plots are two views of it
+        log_counts = self.histogram_options["log_counts"]
+        self.hist_model = self.aggregator.hist_model
+        self.hist2_model = self.aggregator.hist2_model
+        hist_range = (self.hist_model.edges[0], self.hist_model.edges[-1])
+        self.correlation_model = self.aggregator.correlation_model
+        self.qber_model = self.aggregator.qber_model
+        self.kbps_model = self.aggregator.kbps_model
+        self.visibility_model = self.aggregator.visibility_model
+        self.spd1_model = self.aggregator.spd1_model
+        self.series_models = self.aggregator.series_models
+        self.plot_models = self.aggregator.plot_models
+
+        for plot_widget in (self.hist_plot_all, self.hist_plot_tab):
+            HistogramView(plot_widget, self.hist_model, '#FF6F61', log_counts)
+            configure_histogram_plot(plot_widget, "Timestamp Histogram (SPD1)", '#FF6F61', hist_range, log_counts)
+        for plot_widget in (self.hist2_plot_all, self.hist2_plot_tab):
+            HistogramView(plot_widget, self.hist2_model, '#FFCA28', log_counts)
+            configure_histogram_plot(plot_widget, "Timestamp Histogram (SPD2)", '#FFCA28', hist_range, log_counts)
+        CorrelationView(self.correlation_plot_tab, self.correlation_model, '#26A69A')
+        configure_histogram_plot(self.correlation_plot_tab, "SPD1/SPD2 Cross-Correlation", '#26A69A',
+                                 (self.correlation_model.edges[0], self.correlation_model.edges[-1]))
+        self.correlation_plot_tab.setLabel('bottom', 'Delay t2 - t1 (ps)', color='#E0F7FA', size='12pt')
+
+        self.line_views = {}
+        qber_ticks = [(i, f"{i:.0f}") for i in range(0, 21, 2)]
+        kbps_ticks = [(i, f"{i:.0f}") for i in range(0, 11, 2)]
+        ratio_ticks = [(i/10, f"{i/10:.1f}") for i in range(0, 11, 2)]
+        for plot_widget in (self.qber_plot_all, self.qber_plot_tab):
+            self.line_views[plot_widget] = LineView(plot_widget, self.qber_model, '#40C4FF', 'QBER (%)', (0, 20), qber_ticks, qber_axis, self.plot_window, self.tick_step, self.worker.request_view)
+            configure_line_plot(plot_widget, 'QBER (%)', "Quantum Bit Error Rate", y_range=(0, 20))
+        for plot_widget in (self.kbps_plot_all, self.kbps_plot_tab):
+            self.line_views[plot_widget] = LineView(plot_widget, self.kbps_model, '#AB47BC', 'kbps', (0, 10), kbps_ticks, None, self.plot_window, self.tick_step, self.worker.request_view)
+            configure_line_plot(plot_widget, 'kbps', "Throughput (kbps)", y_range=(0, 10))
+        for plot_widget in (self.visibility_plot_all, self.visibility_plot_tab):
+            self.line_views[plot_widget] = LineView(plot_widget, self.visibility_model, '#26A69A', 'Ratio', (0, 1), ratio_ticks, visibility_axis, self.plot_window, self.tick_step, self.worker.request_view)
+            configure_line_plot(plot_widget, 'Ratio', "Visibility Ratio", y_range=(0, 1))
+        for plot_widget in (self.spd1_plot_all, self.spd1_plot_tab):
+            self.line_views[plot_widget] = LineView(plot_widget, self.spd1_model, '#FF6F61', 'Value', (0, 1), ratio_ticks, None, self.plot_window, self.tick_step, self.worker.request_view)
+            configure_line_plot(plot_widget, 'Value', "SPD1 Decoy Randomness", y_range=(0, 1))
+
+        # Rolling statistics over every line: the short EWMA solid, the window's 5th and 95th percentiles dashed
+        line_plots = {"qber": (self.qber_plot_all, self.qber_plot_tab), "kbps": (self.kbps_plot_all, self.kbps_plot_tab),
+                      "visibility": (self.visibility_plot_all, self.visibility_plot_tab),
+                      "spd1_decaystate": (self.spd1_plot_all, self.spd1_plot_tab)}
+        for name, plot_widgets in line_plots.items():
+            ewma_model, low_model, high_model = self.aggregator.overlay_models[name]
+            for plot_widget in plot_widgets:
+                line_view = self.line_views[plot_widget]
+                OverlayView(plot_widget, ewma_model, pg.mkPen('#FFF176', width=1.5), line_view)
+                band_pen = pg.mkPen('#B0BEC5', width=1, style=Qt.PenStyle.DashLine)
+                OverlayView(plot_widget, low_model, band_pen, line_view)
+                OverlayView(plot_widget, high_model, band_pen, line_view)
+
+        self.tab_widget.currentChanged.connect(self.refresh_stale_views)
+
+    def reset_plots(self):
+        snapshot = self.worker.reset()
+        self.session_time = snapshot.session_time
+        self.current_session = snapshot.session
+        self.latest_plots = dict(snapshot.plots)
+        self.x_key = None
+        for model, data in snapshot.plots.items():
+            model.reset_views(data)
+        self.show_key_quality(snapshot.key_quality)
 
-        self.hist_data_tab = np.zeros(40)
-        self.hist_bar_tab = pg.BarGraphItem(x0=np.arange(40)*100, height=self.hist_data_tab, width=100, brush='#FF6F61')
-        self.hist_plot_tab.addItem(self.hist_bar_tab)
-        configure_histogram_plot(self.hist_plot_tab, "Timestamp Histogram (SPD1)", '#FF6F61')
-        self.hist_labels_tab = []
-        for i in range(40):
-            label = pg.TextItem(text="0", color='#E0F7FA', anchor=(0.5, 1.0))
-            label.setPos(bar_centers[i], self.hist_data_tab[i] + 0.5)
-            self.hist_plot_tab.addItem(label)
-            self.hist_labels_tab.append(label)
+    def on_mouse_moved(self, plot_widget, pos):
+        vb = plot_widget.getViewBox()
+        scene_pos = vb.mapSceneToView(pos)
+        x, y = scene_pos.x(), scene_pos.y()
 
-        self.hist2_data_tab = np.zeros(40)
-        self.hist2_bar_tab = pg.BarGraphItem(x0=np.arange(40)*100, height=self.hist2_data_tab, width=100, brush='#FFCA28')
-        self.hist2_plot_tab.addItem(self.hist2_bar_tab)
-        configure_histogram_plot(self.hist2_plot_tab, "Timestamp Histogram (SPD2)", '#FFCA28')
-        self.hist2_labels_tab = []
-        for i in range(40):
-            label = pg.TextItem(text="0", color='#E0F7FA', anchor=(0.5, 1.0))
-            label.setPos(bar_centers[i], self.hist2_data_tab[i] + 0.5)
-            self.hist2_plot_tab.addItem(label)
-            self.hist2_labels_tab.append(label)
+        view = self.line_views.get(plot_widget)
+        if view is None or view.series is None:
+            return
+        x_data, y_data, y_label = view.series.x, view.series.y, view.y_label
+
+        # The drawn points are samples at their own x even when decimated. Only points within
+        # TOOLTIP_RADIUS in x can be close enough, and x is sorted, so two binary searches bound
+        # the candidates
+        first = int(np.searchsorted(x_data, x - TOOLTIP_RADIUS))
+        last = int(np.searchsorted(x_data, x + TOOLTIP_RADIUS, side="right"))
+        if first == last:
+            plot_widget.tooltip.hide()
+            return
 
-        self.qber_x_all = []
-        self.qber_y_all = []
-        self.qber_line_all = self.qber_plot_all.plot(self.qber_x_all, self.qber_y_all, pen=pg.mkPen('#40C4FF', width=2), symbol='o', symbolBrush='#40C4FF', symbolSize=8)
-        configure_line_plot(self.qber_plot_all, 'QBER (%)', "Quantum Bit Error Rate", y_range=(0, 20))
+        distances = np.hypot(x_data[first:last] - x, y_data[first:last] - y)
+        closest_idx = int(np.argmin(distances))
+        if distances[closest_idx] < TOOLTIP_RADIUS:
+            x_val, y_val = x_data[first + closest_idx], y_data[first + closest_idx]
+            plot_widget.tooltip.setText(f"Time: {x_val:.2f} s\n{y_label}: {y_val:.4f}")
+            plot_widget.tooltip.setPos(x_val, y_val)
+            plot_widget.tooltip.show()
+        else:
+            plot_widget.tooltip.hide()
 
-        self.qber_x_tab = []
-        self.qber_y_tab = []
-        self.qber_line_tab = self.qber_plot_tab.plot(self.qber_x_tab, self.qber_y_tab, pen=pg.mkPen('#40C4FF', width=2), symbol='o', symbolBrush='#40C4FF', symbolSize=8)
-        configure_line_plot(self.qber_plot_tab, 'QBER (%)', "Quantum Bit Error Rate", y_range=(0, 20))
+    def setup_timer(self):
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(FRAME_INTERVAL * 1000))
+        self.timer.timeout.connect(self.update_plots)
 
-        self.kbps_x_all = []
-        self.kbps_y_all = []
-        self.kbps_line_all = self.kbps_plot_all.plot(self.kbps_x_all, self.kbps_y_all, pen=pg.mkPen('#AB47BC', width=2), symbol='o', symbolBrush='#AB47BC', symbolSize=8)
-        configure_line_plot(self.kbps_plot_all, 'kbps', "Throughput (kbps)", y_range=(0, 10))
+    def update_plots(self):
+        # The worker thread has already aggregated everything queued, a frame only draws its latest
+        # snapshot, and any zoomed ranges it took, so the cost of a frame does not grow with the
+        # number of samples behind it.
+        # With none for IDLE_FRAMES frames the timer drops to the idle rate until one comes.
+        self.show_alarms()
+        self.show_lag()
+        for view, views in self.worker.take_views().items():
+            view.draw_view_range(views)
+        snapshot = self.worker.take_snapshot()
+        if snapshot is None:
+            self.idle_frames += 1
+            if self.idle_frames == IDLE_FRAMES:
+                self.timer.setInterval(int(IDLE_INTERVAL * 1000))
+            return
+        if self.idle_frames >= IDLE_FRAMES:
+            self.timer.setInterval(int(FRAME_INTERVAL * 1000))
+        self.idle_frames = 0
+        self.render_frame(snapshot)
+
+    def current_frame(self):
+        current_time = self.session_time
+        x_min = max(0, current_time - self.view_span)
+        x_start = math.floor(x_min / self.tick_step) * self.tick_step
+        # The tick list only changes when the window moves past a tick, views skip setTicks until then
+        x_key = (x_start, int(current_time))
+        if x_key != self.x_key:
+            self.x_ticks = [(i, f"{i:.0f}") for i in range(x_start, int(current_time) + self.tick_step, self.tick_step)]
+            self.x_key = x_key
+        return x_min, current_time, self.x_ticks
+
+    def refresh_stale_views(self, index=None):
+        # Views on the tab that was just selected catch up with their model's last snapshot in one redraw
+        frame = self.current_frame()
+        for model, data in self.latest_plots.items():
+            for view in model.views:
+                if view.stale:
+                    view.refresh(data, frame)
+
+    def render_frame(self, snapshot):
+        self.session_time = snapshot.session_time
+        self.current_session = snapshot.session
+        frame = self.current_frame()
+        for model, data in snapshot.plots.items():
+            self.latest_plots[model] = data
+            model.refresh_views(frame, data)
+        changes = snapshot.changes
+        if 'key' in changes:
+            session, length, key = snapshot.key_text
+            self.key_display.setText(f"Key (Session {session}, Length {length}): {key.text(40)}...")
+            self.key_display.setToolTip(key.text())
+        if 'key_quality' in changes:
+            self.show_key_quality(snapshot.key_quality)
+        if 'status' in changes:
+            self.show_status()
 
-        self.kbps_x_tab = []
-        self.kbps_y_tab = []
-        self.kbps_line_tab = self.kbps_plot_tab.plot(self.kbps_x_tab, self.kbps_y_tab, pen=pg.mkPen('#AB47BC', width=2), symbol='o', symbolBrush='#AB47BC', symbolSize=8)
-        configure_line_plot(self.kbps_plot_tab, 'kbps', "Throughput (kbps)", y_range=(0, 10))
+    def start_processor(self):
+        logging.info("Starting processor")
+        self.restart_processor(0)
 
-        self.visibility_x_all = []
-        self.visibility_y_all = []
-        self.visibility_line_all = self.visibility_plot_all.plot(self.visibility_x_all, self.visibility_y_all, pen=pg.mkPen('#26A69A', width=2), symbol='o', symbolBrush='#26A69A', symbolSize=8)
-        configure_line_plot(self.visibility_plot_all, 'Ratio', "Visibility Ratio", y_range=(0, 1))
+    def seek_to_session(self):
+        text = self.session_field.text().strip()
+        if not text.isdigit():
+            self.status_bar.showMessage(f"Mode: {self.mode.capitalize()} | Enter a session number to seek to")
+            return
+        session = int(text)
+        # Start far enough back to refill the plot window before the requested session
+        file_position = self.processor.session_file_position(session, window_sessions=int(self.plot_window / SESSION_INTERVAL))
+        if file_position is None:
+            self.status_bar.showMessage(f"Mode: {self.mode.capitalize()} | Session {session} is not indexed yet")
+            return
+        logging.info(f"Seeking to session {session} from file position {file_position}")
+        self.processor.stop()
+        while not self.data_queue.empty():
+            self.data_queue.get_nowait()
+        self.restart_processor(file_position)
 
-        self.visibility_x_tab = []
-        self.visibility_y_tab = []
-        self.visibility_line_tab = self.visibility_plot_tab.plot(self.visibility_x_tab, self.visibility_y_tab, pen=pg.mkPen('#26A69A', width=2), symbol='o', symbolBrush='#26A69A', symbolSize=8)
-        configure_line_plot(self.visibility_plot_tab, 'Ratio', "Visibility Ratio", y_range=(0, 1))
-
-        self.spd1_x_all = []
-        self.spd1_y_all = []
-        self.spd1_line_all = self.spd1_plot_all.plot(self.spd1_x_all, self.spd1_y_all, pen=pg.mkPen('#FF6F61', width=2), symbol='o', symbolBrush='#FF6F61', symbolSize=8)
-        configure_line_plot(self.spd1_plot_all, 'Value', "SPD1 Decoy Randomness", y_range=(0, 1))
-
-        self.spd1_x_tab = []
-        self.spd1_y_tab = []
-        self.spd1_line_tab = self.spd1_plot_tab.plot(self.spd1_x_tab, self.spd1_y_tab, pen=pg.mkPen('#FF6F61', width=2), symbol='o', symbolBrush='#FF6F61', symbolSize=8)
-        configure_line_plot(self.spd1_plot_tab, 'Value', "SPD1 Decoy Randomness", y_range=(0, 1))
-
-    def on_mouse_moved(self, plot_widget, pos):
-        vb = plot_widget.getViewBox()
-        scene_pos = vb.mapSceneToView(pos)
-        x, y = scene_pos.x(), scene_pos.y()
-
-        if plot_widget == self.qber_plot_all:
-            x_data, y_data = self.qber_x_all, self.qber_y_all
-            y_label = "QBER (%)"
-        elif plot_widget == self.qber_plot_tab:
-            x_data, y_data = self.qber_x_tab, self.qber_y_tab
-            y_label = "QBER (%)"
-        elif plot_widget == self.kbps_plot_all:
-            x_data, y_data = self.kbps_x_all, self.kbps_y_all
-            y_label = "kbps"
-        elif plot_widget == self.kbps_plot_tab:
-            x_data, y_data = self.kbps_x_tab, self.kbps_y_tab
-            y_label = "kbps"
-        elif plot_widget == self.visibility_plot_all:
-            x_data, y_data = self.visibility_x_all, self.visibility_y_all
-            y_label = "Ratio"
-        elif plot_widget == self.visibility_plot_tab:
-            x_data, y_data = self.visibility_x_tab, self.visibility_y_tab
-            y_label = "Ratio"
-        elif plot_widget == self.spd1_plot_all:
-            x_data, y_data = self.spd1_x_all, self.spd1_y_all
-            y_label = "Value"
-        elif plot_widget == self.spd1_plot_tab:
-            x_data, y_data = self.spd1_x_tab, self.spd1_y_tab
-            y_label = "Value"
-        else:
-            plot_widget.tooltip.hide()
-            return
-
-        if not x_data:
-            plot_widget.tooltip.hide()
-            return
-
-        x_array = np.array(x_data)
-        y_array = np.array(y_data)
-        distances = np.sqrt((x_array - x) ** 2 + (y_array - y) ** 2)
-        closest_idx = np.argmin(distances)
-        if distances[closest_idx] < 0.5:
-            x_val, y_val = x_data[closest_idx], y_data[closest_idx]
-            plot_widget.tooltip.setText(f"Time: {x_val:.2f} s\n{y_label}: {y_val:.4f}")
-            plot_widget.tooltip.setPos(x_val, y_val)
-            plot_widget.tooltip.show()
-        else:
-            plot_widget.tooltip.hide()
-
-    def setup_timer(self):
-        self.timer = QTimer(self)
-        self.timer.setInterval(20)
-        self.timer.timeout.connect(self.update_plots)
-
-    def update_plots(self):
-        try:
-            for _ in range(50):
-                data = self.data_queue.get_nowait()
-                current_time = time.time() - self.start_time
-                logging.debug(f"Processing data: {data}")
-
-                x_min = max(0, current_time - 60)
-                x_start = math.floor(x_min / 5) * 5
-                x_ticks = [(i, f"{i:.0f}") for i in range(x_start, int(current_time) + 5, 5)]
-
-                if data['type'] == 'session_number':
-                    new_session = data['value']
-                    if new_session != self.current_session:
-                        expected_types = {'timestamp_spd1', 'timestamp_spd2', 'spd1_decaystate', 'visibility', 'qber'}
-                        if new_session % 2 == 0:
-                            expected_types.add('key')
-                        else:
-                            expected_types.add('kbps_data')
-                        missing_types = expected_types - self.session_data_types
-                        if missing_types:
-                            logging.info(f"Session {self.current_session} missing data types: {missing_types}")
-                            if self.current_session == -1:
-                                for data_type in missing_types:
-                                    if data_type in ['timestamp_spd1', 'timestamp_spd2']:
-                                        continue
-                                    elif data_type == 'key':
-                                        self.update_plot_data('key', "0" * 128, current_time, x_ticks, length=128)
-                                        self.last_session_data['key'] = "0" * 128
-                                        logging.info(f"Initialized missing {data_type} to '{'0' * 128}' for session {self.current_session}")
-                                    else:
-                                        # For qber, visibility, kbps_data, spd1_decaystate, set to 0 but do not plot
-                                        self.last_session_data[data_type] = 0
-                                        logging.info(f"Initialized missing {data_type} to 0 for session {self.current_session}")
-                            else:
-                                for data_type in missing_types:
-                                    if data_type in ['timestamp_spd1', 'timestamp_spd2']:
-                                        for value in self.last_session_data[data_type]:
-                                            self.update_plot_data(data_type, value, current_time, x_ticks)
-                                    elif self.last_session_data[data_type] is not None:
-                                        if data_type == 'key':
-                                            self.update_plot_data(data_type, self.last_session_data[data_type], current_time, x_ticks, length=len(self.last_session_data[data_type]))
-                                        elif data_type == 'kbps_data':
-                                            self.update_plot_data(data_type, self.last_session_data[data_type], current_time, x_ticks, kbps=True)
-                                        else:
-                                            self.update_plot_data(data_type, self.last_session_data[data_type], current_time, x_ticks)
-                        self.current_session = new_session
-                        self.session_data_types = set()
-                        self.status_bar.showMessage(f"Mode: {self.mode.capitalize()} | Session: {self.current_session}")
-                        self.last_session_data["timestamp_spd1"] = []
-                        self.last_session_data["timestamp_spd2"] = []
-                    continue
-
-                self.session_data_types.add(data['type'])
-                self.update_plot_data(data['type'], data.get('value', data.get('kbps')), current_time, x_ticks, length=data.get('length'), kbps='kbps' in data)
-
-        except Empty:
-            pass
-
-    def update_plot_data(self, data_type, value, current_time, x_ticks, length=None, kbps=False):
-        if data_type == 'timestamp_spd1':
-            timestamp_ps = int(value)
-            logging.debug(f"SPD1 timestamp: {timestamp_ps}")
-            partition1 = min((timestamp_ps // 100) % 40, 39)
-            self.hist_data_all[partition1] += 1
-            self.hist_bar_all.setOpts(height=self.hist_data_all, brush='#FF6F61')
-            self.hist_labels_all[partition1].setText(str(int(self.hist_data_all[partition1])))
-            self.hist_labels_all[partition1].setPos(partition1*100 + 50, self.hist_data_all[partition1] + 0.5)
-            self.hist_plot_all.setYRange(0, max(self.hist_data_all.max() * 1.2, 10))
-            logging.debug(f"SPD1 histogram data: {self.hist_data_all}")
-
-            self.hist_data_tab[partition1] += 1
-            self.hist_bar_tab.setOpts(height=self.hist_data_tab, brush='#FF6F61')
-            self.hist_labels_tab[partition1].setText(str(int(self.hist_data_tab[partition1])))
-            self.hist_labels_tab[partition1].setPos(partition1*100 + 50, self.hist_data_tab[partition1] + 0.5)
-            self.hist_plot_tab.setYRange(0, max(self.hist_data_tab.max() * 1.2, 10))
-            logging.debug(f"SPD1 tab histogram data: {self.hist_data_tab}")
-            self.last_session_data["timestamp_spd1"].append(timestamp_ps)
-
-        elif data_type == 'timestamp_spd2':
-            timestamp_ps = int(value)
-            logging.debug(f"SPD2 timestamp: {timestamp_ps}")
-            partition2 = min((timestamp_ps // 100) % 40, 39)
-            self.hist2_data_all[partition2] += 1
-            self.hist2_bar_all.setOpts(height=self.hist2_data_all, brush='#FFCA28')
-            self.hist2_labels_all[partition2].setText(str(int(self.hist2_data_all[partition2])))
-            self.hist2_labels_all[partition2].setPos(partition2*100 + 50, self.hist2_data_all[partition2] + 0.5)
-            self.hist2_plot_all.setYRange(0, max(self.hist2_data_all.max() * 1.2, 10))
-            logging.debug(f"SPD2 histogram data: {self.hist2_data_all}")
-
-            self.hist2_data_tab[partition2] += 1
-            self.hist2_bar_tab.setOpts(height=self.hist2_data_tab, brush='#FFCA28')
-            self.hist2_labels_tab[partition2].setText(str(int(self.hist2_data_tab[partition2])))
-            self.hist2_labels_tab[partition2].setPos(partition2*100 + 50, self.hist2_data_tab[partition2] + 0.5)
-            self.hist2_plot_tab.setYRange(0, max(self.hist2_data_tab.max() * 1.2, 10))
-            logging.debug(f"SPD2 tab histogram data: {self.hist2_data_tab}")
-            self.last_session_data["timestamp_spd2"].append(timestamp_ps)
-
-        elif data_type == 'qber':
-            qber_val = float(value)
-            logging.debug(f"QBER: {qber_val}")
-            self.qber_x_all.append(current_time)
-            self.qber_y_all.append(qber_val)
-            while self.qber_x_all and self.qber_x_all[0] < current_time - 60:
-                self.qber_x_all.pop(0)
-                self.qber_y_all.pop(0)
-            self.qber_line_all.setData(self.qber_x_all, self.qber_y_all)
-            self.qber_plot_all.setXRange(max(0, current_time - 60), current_time)
-            self.qber_plot_all.getAxis('bottom').setTicks([x_ticks])
-            # Set y-axis range based on min and max of data in 60s window
-            if self.qber_y_all:
-                qber_min = min(self.qber_y_all)
-                qber_max = max(self.qber_y_all)
-                qber_range = qber_max - qber_min
-                margin = qber_range * 0.1 if qber_range > 0 else 2.0
-                qber_lower = max(0, qber_min - margin)
-                qber_upper = qber_max + margin
-                tick_interval = max(2.0, math.ceil((qber_upper - qber_lower) / 10))
-                qber_ticks = [qber_lower + i * tick_interval for i in range(int((qber_upper - qber_lower) / tick_interval) + 1)]
-            else:
-                qber_lower, qber_upper = 0, 20
-                qber_ticks = list(range(0, 21, 2))
-            self.qber_plot_all.setYRange(qber_lower, qber_upper)
-            self.qber_plot_all.getAxis('left').setTicks([[(val, f"{val:.2f}") for val in qber_ticks]])
-
-            self.qber_x_tab.append(current_time)
-            self.qber_y_tab.append(qber_val)
-            while self.qber_x_tab and self.qber_x_tab[0] < current_time - 60:
-                self.qber_x_tab.pop(0)
-                self.qber_y_tab.pop(0)
-            self.qber_line_tab.setData(self.qber_x_tab, self.qber_y_tab)
-            self.qber_plot_tab.setXRange(max(0, current_time - 60), current_time)
-            self.qber_plot_tab.getAxis('bottom').setTicks([x_ticks])
-            if self.qber_y_tab:
-                qber_min = min(self.qber_y_tab)
-                qber_max = max(self.qber_y_tab)
-                qber_range = qber_max - qber_min
-                margin = qber_range * 0.1 if qber_range > 0 else 2.0
-                qber_lower = max(0, qber_min - margin)
-                qber_upper = qber_max + margin
-                tick_interval = max(2.0, math.ceil((qber_upper - qber_lower) / 10))
-                qber_ticks = [qber_lower + i * tick_interval for i in range(int((qber_upper - qber_lower) / tick_interval) + 1)]
-            else:
-                qber_lower, qber_upper = 0, 20
-                qber_ticks = list(range(0, 21, 2))
-            self.qber_plot_tab.setYRange(qber_lower, qber_upper)
-            self.qber_plot_tab.getAxis('left').setTicks([[(val, f"{val:.2f}") for val in qber_ticks]])
-            self.last_session_data["qber"] = qber_val
-
-        elif data_type == 'kbps_data':
-            kbps = float(value)
-            logging.debug(f"KBPS: {kbps}")
-            self.kbps_x_all.append(current_time)
-            self.kbps_y_all.append(kbps)
-            while self.kbps_x_all and self.kbps_x_all[0] < current_time - 60:
-                self.kbps_x_all.pop(0)
-                self.kbps_y_all.pop(0)
-            self.kbps_line_all.setData(self.kbps_x_all, self.kbps_y_all)
-            self.kbps_plot_all.setXRange(max(0, current_time - 60), current_time)
-            self.kbps_plot_all.getAxis('bottom').setTicks([x_ticks])
-
-            self.kbps_x_tab.append(current_time)
-            self.kbps_y_tab.append(kbps)
-            while self.kbps_x_tab and self.kbps_x_tab[0] < current_time - 60:
-                self.kbps_x_tab.pop(0)
-                self.kbps_y_tab.pop(0)
-            self.kbps_line_tab.setData(self.kbps_x_tab, self.kbps_y_tab)
-            self.kbps_plot_tab.setXRange(max(0, current_time - 60), current_time)
-            self.kbps_plot_tab.getAxis('bottom').setTicks([x_ticks])
-            self.last_session_data["kbps_data"] = kbps
-
-        elif data_type == 'key':
-            logging.debug(f"Key (length {length}): {value[:40]}...")
-            self.key_display.setText(f"Key (Session {self.current_session}, Length {length}): {value[:40]}...")
-            self.key_display.setToolTip(value)
-            self.last_session_data["key"] = value
-
-        elif data_type == 'visibility':
-            vis_val = float(value)
-            logging.debug(f"Visibility: {vis_val}")
-            self.visibility_x_all.append(current_time)
-            self.visibility_y_all.append(vis_val)
-            while self.visibility_x_all and self.visibility_x_all[0] < current_time - 60:
-                self.visibility_x_all.pop(0)
-                self.visibility_y_all.pop(0)
-            self.visibility_line_all.setData(self.visibility_x_all, self.visibility_y_all)
-            self.visibility_plot_all.setXRange(max(0, current_time - 60), current_time)
-            self.visibility_plot_all.getAxis('bottom').setTicks([x_ticks])
-            if self.visibility_y_all:
-                vis_min = min(self.visibility_y_all)
-                vis_max = max(self.visibility_y_all)
-                vis_range = vis_max - vis_min
-                margin = vis_range * 0.1 if vis_range > 0 else 0.05
-                vis_lower = max(0, vis_min - margin)
-                vis_upper = vis_max + margin
-                tick_interval = max(0.1, round((vis_upper - vis_lower) / 10, 1))
-                vis_ticks = [vis_lower + i * tick_interval for i in range(int((vis_upper - vis_lower) / tick_interval) + 1)]
-            else:
-                vis_lower, vis_upper = 0, 1
-                vis_ticks = [i/10 for i in range(0, 11, 2)]
-            self.visibility_plot_all.setYRange(vis_lower, vis_upper)
-            self.visibility_plot_all.getAxis('left').setTicks([[(val, f"{val:.2f}") for val in vis_ticks]])
-
-            self.visibility_x_tab.append(current_time)
-            self.visibility_y_tab.append(vis_val)
-            while self.visibility_x_tab and self.visibility_x_tab[0] < current_time - 60:
-                self.visibility_x_tab.pop(0)
-                self.visibility_y_tab.pop(0)
-            self.visibility_line_tab.setData(self.visibility_x_tab, self.visibility_y_tab)
-            self.visibility_plot_tab.setXRange(max(0, current_time - 60), current_time)
-            self.visibility_plot_tab.getAxis('bottom').setTicks([x_ticks])
-            if self.visibility_y_tab:
-                vis_min = min(self.visibility_y_tab)
-                vis_max = max(self.visibility_y_tab)
-                vis_range = vis_max - vis_min
-                margin = vis_range * 0.1 if vis_range > 0 else 0.05
-                vis_lower = max(0, vis_min - margin)
-                vis_upper = vis_max + margin
-                tick_interval = max(0.1, round((vis_upper - vis_lower) / 10, 1))
-                vis_ticks = [vis_lower + i * tick_interval for i in range(int((vis_upper - vis_lower) / tick_interval) + 1)]
-            else:
-                vis_lower, vis_upper = 0, 1
-                vis_ticks = [i/10 for i in range(0, 11, 2)]
-            self.visibility_plot_tab.setYRange(vis_lower, vis_upper)
-            self.visibility_plot_tab.getAxis('left').setTicks([[(val, f"{val:.2f}") for val in vis_ticks]])
-            self.last_session_data["visibility"] = vis_val
-
-        elif data_type == 'spd1_decaystate':
-            spd1_val = float(value)
-            logging.debug(f"SPD1 Decay: {spd1_val}")
-            self.spd1_x_all.append(current_time)
-            self.spd1_y_all.append(spd1_val)
-            while self.spd1_x_all and self.spd1_x_all[0] < current_time - 60:
-                self.spd1_x_all.pop(0)
-                self.spd1_y_all.pop(0)
-            self.spd1_line_all.setData(self.spd1_x_all, self.spd1_y_all)
-            self.spd1_plot_all.setXRange(max(0, current_time - 60), current_time)
-            self.spd1_plot_all.getAxis('bottom').setTicks([x_ticks])
-
-            self.spd1_x_tab.append(current_time)
-            self.spd1_y_tab.append(spd1_val)
-            while self.spd1_x_tab and self.spd1_x_tab[0] < current_time - 60:
-                self.spd1_x_tab.pop(0)
-                self.spd1_y_tab.pop(0)
-            self.spd1_line_tab.setData(self.spd1_x_tab, self.spd1_y_tab)
-            self.spd1_plot_tab.setXRange(max(0, current_time - 60), current_time)
-            self.spd1_plot_tab.getAxis('bottom').setTicks([x_ticks])
-            self.last_session_data["spd1_decaystate"] = spd1_val
-
-    def start_processor(self):
-        logging.info("Starting processor")
-        self.processor.stop()
-        input_string = self.input_field.text() or "default_input" if self.mode == "console" else None
-        self.processor = DataProcessor(self.data_queue, mode=self.mode, file_position=0, input_string=input_string)
-        self.processor.start()
-        self.start_button.setEnabled(False)
-        self.stop_button.setEnabled(True)
-        self.resume_button.setEnabled(False)
-        self.mode_button.setEnabled(False)
-        self.start_time = time.time()
-        self.current_session = -1
-        self.file_position = 0
-        self.session_data_types = set()
-        self.last_session_data = {
-            "timestamp_spd1": [],
-            "timestamp_spd2": [],
-            "spd1_decaystate": None,
-            "visibility": None,
-            "qber": None,
-            "key": None,
-            "kbps_data": None
-        }
-        self.key_display.setText(f"Key (None): None")
-        self.hist_data_all.fill(0)
-        self.hist_data_tab.fill(0)
-        self.hist2_data_all.fill(0)
-        self.hist2_data_tab.fill(0)
-        self.hist_bar_all.setOpts(height=self.hist_data_all, brush='#FF6F61')
-        self.hist_bar_tab.setOpts(height=self.hist_data_tab, brush='#FF6F61')
-        self.hist2_bar_all.setOpts(height=self.hist2_data_all, brush='#FFCA28')
-        self.hist2_bar_tab.setOpts(height=self.hist2_data_tab, brush='#FFCA28')
-        self.qber_x_all.clear()
-        self.qber_y_all.clear()
-        self.qber_x_tab.clear()
-        self.qber_y_tab.clear()
-        self.kbps_x_all.clear()
-        self.kbps_y_all.clear()
-        self.kbps_x_tab.clear()
-        self.kbps_y_tab.clear()
-        self.visibility_x_all.clear()
-        self.visibility_y_all.clear()
-        self.visibility_x_tab.clear()
-        self.visibility_y_tab.clear()
-        self.spd1_x_all.clear()
-        self.spd1_y_all.clear()
-        self.spd1_x_tab.clear()
-        self.spd1_y_tab.clear()
-        self.qber_line_all.setData([], [])
-        self.qber_line_tab.setData([], [])
-        self.kbps_line_all.setData([], [])
-        self.kbps_line_tab.setData([], [])
-        self.visibility_line_all.setData([], [])
-        self.visibility_line_tab.setData([], [])
-        self.spd1_line_all.setData([], [])
-        self.spd1_line_tab.setData([], [])
-        self.timer.start()
+    def restart_processor(self, file_position):
+        self.processor.stop()
+        self.reset_plots()
+        input_string = self.input_field.text() or "default_input" if self.mode == "console" else None
+        self.processor = DataProcessor(self.data_queue, mode=self.mode, file_position=file_position, input_string=input_string, **self.processor_options)
+        self.processor.start()
+        self.start_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.resume_button.setEnabled(False)
+        self.mode_button.setEnabled(False)
+        self.file_position = file_position
+        self.key_display.setText(f"Key (None): None")
+        self.timer.start()
 
     def stop_processor(self):
         logging.info("Stopping processor")
@@ -7645,9 +7673,12 @@ class MainWindow(QWidget):
         if self.mode != "file":
             logging.warning("Resume is only available in file mode")
             return
-        logging.info(f"Resuming processor at file position {self.file_position}, start_time={self.start_time}")
+        logging.info(f"Resuming processor at file position {self.file_position}, session_time={self.session_time}")
         self.processor.stop()
-        self.processor = DataProcessor(self.data_queue, mode=self.mode, file_position=self.file_position, input_string=None)
+        # Key quality tests and rolling statistics carry on over the values already parsed
+        self.processor = DataProcessor(self.data_queue, mode=self.mode, file_position=self.file_position, input_string=None,
+                                       key_quality=self.processor.key_quality, stats=self.processor.stats,
+                                       **self.processor_options)
         self.processor.start()
         self.start_button.setEnabled(False)
         self.stop_button.setEnabled(True)
@@ -7658,6 +7689,7 @@ class MainWindow(QWidget):
     def closeEvent(self, event):
         logging.info("Closing window")
         self.processor.close()
+        self.worker.stop()
         self.marquee_timer.stop()
         self.timer.stop()
         event.accept()
@@ -0,0 +1,77 @@
+import json
+import logging
+import signal
+import sys
+import threading
+import time
+from queue import Empty
+from aggregator import Aggregator
+
+
+class HeadlessRunner:
+    # Runs a DataProcessor into an Aggregator without Qt and writes the aggregator's summary as one
+    # JSON line every `interval` seconds, to `output_path` or to stdout. Stops after `duration`
+    # seconds, when the processor's reader thread ends, or on SIGINT/SIGTERM, and always writes a
+    # final summary on the way out.
+    def __init__(self, data_queue, processor, aggregator: Aggregator, interval: float = 10.0, output_path: str = None, duration: float = None):
+        self.data_queue = data_queue
+        self.processor = processor
+        self.aggregator = aggregator
+        self.interval = interval
+        self.output_path = output_path
+        self.duration = duration
+        self.stop_event = threading.Event()
+
+    def stop(self, *args):
+        self.stop_event.set()
+
+    def run(self):
+        output = open(self.output_path, "a") if self.output_path else sys.stdout
+        started = time.monotonic()
+        next_summary = started + self.interval
+        self.processor.start()
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    self.aggregator.process(self.data_queue.get(timeout=min(self.interval, 0.1)))
+                    self.aggregator.drain(self.data_queue)
+                except Empty:
+                    if self.processor.thread is not None and not self.processor.thread.is_alive():
+                        logging.info("Data processor finished")
+                        break
+                now = time.monotonic()
+                if now >= next_summary:
+                    self.write_summary(output)
+                    next_summary = max(next_summary + self.interval, now)
+                if self.duration is not None and now - started >= self.duration:
+                    break
+        finally:
+            self.processor.stop()
+            self.aggregator.drain(self.data_queue)
+            self.write_summary(output)
+            if output is not sys.stdout:
+                output.close()
+
+    def write_summary(self, output):
+        summary = self.aggregator.summary()
+        summary["time"] = time.time()
+        summary["statistics"] = self.processor.statistics()
+        if self.processor.alarm_engine is not None:
+            summary["alarms"] = [event.as_dict() for event in self.processor.alarm_engine.active()]
+        if hasattr(self.data_queue, "dropped"):
+            summary["queue"] = {"size": self.data_queue.qsize(), "dropped": self.data_queue.dropped, "coalesced": self.data_queue.coalesced,
+                                "trimmed_timestamps": self.data_queue.trimmed_timestamps}
+        output.write(json.dumps(summary) + "\n")
+        output.flush()
+
+
+def run_headless(data_queue, processor, args):
+    # data_processor configures DEBUG logging on import, which is one line per timestamp here
+    logging.getLogger().setLevel(logging.INFO)
+    histogram_options = {"bins": args.hist_bins, "bin_width": args.hist_bin_width, "start": args.hist_start, "period": args.hist_period}
+    aggregator = Aggregator(args.plot_window, histogram_options, processor.correlation_options)
+    runner = HeadlessRunner(data_queue, processor, aggregator, interval=args.summary_interval,
+                            output_path=args.summary_file, duration=args.duration)
+    signal.signal(signal.SIGINT, runner.stop)
+    signal.signal(signal.SIGTERM, runner.stop)
+    runner.run()
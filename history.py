@@ -0,0 +1,121 @@
+import math
+import numpy as np
+
+# Bucket width in seconds and how many buckets each tier keeps: 6 h of seconds, 7 days of minutes
+# and a year of hours. With BUCKET_SLACK that is about 2 MB per metric however long the run is.
+HISTORY_TIERS = ((1, 6 * 3600), (60, 7 * 24 * 60), (3600, 365 * 24))
+BUCKET_SLACK = 4  # A tier's arrays hold 1 + 1/BUCKET_SLACK times its capacity before they are compacted
+MAX_BUCKETS_PER_COLUMN = 4
+
+
+class BucketTier:
+    # Fixed-width time buckets with the count, sum, min and max of the samples that fell in them.
+    # The newest bucket is updated in place until a sample lands in a later one. Buckets are kept
+    # the way TimeSeriesBuffer keeps samples, appended after the live range and moved to the front
+    # only when the arrays run out, and the oldest are dropped beyond `capacity`. A new bucket
+    # starts at most once per `width` seconds, so a small slack past the capacity is enough to
+    # keep compaction rare.
+    def __init__(self, width: float, capacity: int):
+        self.width = width
+        self.capacity = capacity
+        size = capacity + max(capacity // BUCKET_SLACK, 1)
+        self.starts = np.empty(size, dtype=np.float64)
+        self.counts = np.empty(size, dtype=np.int64)
+        self.sums = np.empty(size, dtype=np.float64)
+        self.mins = np.empty(size, dtype=np.float64)
+        self.maxs = np.empty(size, dtype=np.float64)
+        self.first = 0
+        self.end = 0
+        self.last_bucket = None
+        self.truncated = False  # Whether buckets from the start of the run have been dropped
+
+    def __len__(self):
+        return self.end - self.first
+
+    def add(self, t: float, value: float):
+        bucket = math.floor(t / self.width)
+        if self.end > self.first:
+            if bucket == self.last_bucket:
+                index = self.end - 1
+                self.counts[index] += 1
+                self.sums[index] += value
+                if value < self.mins[index]:
+                    self.mins[index] = value
+                if value > self.maxs[index]:
+                    self.maxs[index] = value
+                return
+            if bucket < self.last_bucket:
+                self.clear()  # Time went backwards, so this is a new run of the output file
+        if self.end == len(self.starts):
+            self.compact()
+        index = self.end
+        self.starts[index] = bucket * self.width
+        self.counts[index] = 1
+        self.sums[index] = value
+        self.mins[index] = value
+        self.maxs[index] = value
+        self.end += 1
+        self.last_bucket = bucket
+        if self.end - self.first > self.capacity:
+            self.first += 1
+            self.truncated = True
+
+    def compact(self):
+        count = self.end - self.first
+        for array in (self.starts, self.counts, self.sums, self.mins, self.maxs):
+            array[:count] = array[self.first:self.end]
+        self.first = 0
+        self.end = count
+
+    def clear(self):
+        self.first = 0
+        self.end = 0
+        self.last_bucket = None
+        self.truncated = False
+
+    def covers(self, t: float):
+        return self.end > self.first and (not self.truncated or self.starts[self.first] <= t)
+
+    def buckets(self, x_min: float, x_max: float):
+        # Views of the buckets that overlap [x_min, x_max]
+        starts = self.starts[self.first:self.end]
+        lo = self.first + int(np.searchsorted(starts, x_min - self.width, side="right"))
+        hi = self.first + int(np.searchsorted(starts, x_max, side="right"))
+        return self.starts[lo:hi], self.counts[lo:hi], self.sums[lo:hi], self.mins[lo:hi], self.maxs[lo:hi]
+
+
+class HistoryPyramid:
+    # Per-second, per-minute and per-hour min/mean/max of one metric, updated as samples arrive,
+    # so a plot can zoom out far past the live window and read only the tier that fits the screen.
+    def __init__(self, tiers=HISTORY_TIERS):
+        self.tiers = [BucketTier(width, capacity) for width, capacity in tiers]
+
+    def add(self, t: float, value: float):
+        for tier in self.tiers:
+            tier.add(t, value)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+    def select_tier(self, x_min: float, x_max: float, columns: int):
+        # The finest tier that still reaches back to x_min and has no more than a few buckets per
+        # pixel column, or the coarsest one when none does
+        for tier in self.tiers:
+            if tier.covers(x_min) and (x_max - x_min) / tier.width <= MAX_BUCKETS_PER_COLUMN * columns:
+                return tier
+        return self.tiers[-1]
+
+    def query(self, x_min: float, x_max: float, columns: int):
+        # Bucket centres with the min, mean and max of each bucket in [x_min, x_max]
+        tier = self.select_tier(x_min, x_max, columns)
+        starts, counts, sums, mins, maxs = tier.buckets(x_min, x_max)
+        return starts + tier.width / 2, mins, sums / counts, maxs
+
+    def envelope(self, x_min: float, x_max: float, columns: int):
+        # The min and max of each bucket in turn, drawn the same way as minmax_decimate() output
+        centers, mins, means, maxs = self.query(x_min, x_max, columns)
+        y_data = np.empty(2 * len(centers))
+        y_data[0::2] = mins
+        y_data[1::2] = maxs
+        return np.repeat(centers, 2), y_data
@@ -0,0 +1,154 @@
+import math
+import numpy as np
+
+BLOCK_FREQUENCY_SIZE = 128  # Bits per block in the block frequency test
+MIN_TEST_BITS = 100  # Fewer bits than this give no meaningful p-values
+SIGNIFICANCE_LEVEL = 0.01  # p-values below this count as a failed test, as in SP 800-22
+
+
+def igamc(a: float, x: float):
+    # Regularized upper incomplete gamma Q(a, x), by its series below a + 1 and its continued
+    # fraction above, as in Numerical Recipes. Only the chi-squared p-value needs it.
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        term = total = 1.0 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+    b = x + 1 - a
+    c = 1.0 / 1e-300
+    d = 1.0 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = d if abs(d) > 1e-300 else 1e-300
+        c = b + an / c
+        c = c if abs(c) > 1e-300 else 1e-300
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(log_prefix) * h
+
+
+class PackedKey:
+    # A key as np.packbits bytes and its length in bits, an eighth of the memory of the '0'/'1'
+    # string it was parsed from. text() unpacks it again for display.
+    __slots__ = ("packed", "length")
+
+    def __init__(self, packed: bytes, length: int):
+        self.packed = packed
+        self.length = length
+
+    @classmethod
+    def from_text(cls, text: str):
+        bits = np.frombuffer(text.encode("ascii"), dtype=np.uint8) - ord("0")
+        return cls(np.packbits(bits).tobytes(), len(text))
+
+    @classmethod
+    def zeros(cls, length: int):
+        return cls(bytes((length + 7) // 8), length)
+
+    def __len__(self):
+        return self.length
+
+    def bits(self):
+        return np.unpackbits(np.frombuffer(self.packed, dtype=np.uint8), count=self.length)
+
+    def text(self, count: int = None):
+        count = self.length if count is None else min(count, self.length)
+        return (np.unpackbits(np.frombuffer(self.packed, dtype=np.uint8), count=count) + ord("0")).tobytes().decode("ascii")
+
+    def __repr__(self):
+        return f"PackedKey({self.text(40)}..., length={self.length})"
+
+
+# Stands in for the key of a session that reported none before any real key was seen. Compared by
+# identity so that it never reaches the quality tests.
+PLACEHOLDER_KEY = PackedKey.zeros(128)
+
+
+class KeyQualityMonitor:
+    # Streaming randomness tests over every key bit seen so far, after NIST SP 800-22: monobit
+    # frequency, runs and block frequency p-values, and the lag-1 serial correlation coefficient.
+    # Each key updates a handful of running sums with vectorized operations on its bits, and only
+    # the bits of an unfinished block are carried over, so memory does not grow with the stream.
+    def __init__(self, block_size: int = BLOCK_FREQUENCY_SIZE):
+        self.block_size = block_size
+        self.clear()
+
+    def clear(self):
+        self.bits = 0
+        self.ones = 0
+        self.transitions = 0  # Adjacent bit pairs that differ, including across keys
+        self.adjacent_ones = 0  # Adjacent bit pairs that are both 1
+        self.last_bit = None
+        self.keys = 0
+        self.blocks = 0
+        self.block_chi_sum = 0.0  # Sum of (block ones / block size - 1/2)^2
+        self.partial_block = np.empty(0, dtype=np.uint8)
+
+    def add(self, key: PackedKey):
+        bits = key.bits()
+        if not len(bits):
+            return
+        self.keys += 1
+        self.bits += len(bits)
+        self.ones += int(np.count_nonzero(bits))
+        self.transitions += int(np.count_nonzero(bits[1:] != bits[:-1]))
+        self.adjacent_ones += int(np.count_nonzero(bits[1:] & bits[:-1]))
+        if self.last_bit is not None:
+            self.transitions += int(bits[0] != self.last_bit)
+            self.adjacent_ones += int(bits[0] & self.last_bit)
+        self.last_bit = int(bits[-1])
+        stream = np.concatenate((self.partial_block, bits)) if len(self.partial_block) else bits
+        blocks = len(stream) // self.block_size
+        if blocks:
+            ones = stream[:blocks * self.block_size].reshape(blocks, self.block_size).sum(axis=1)
+            self.block_chi_sum += float(((ones / self.block_size - 0.5) ** 2).sum())
+            self.blocks += blocks
+        self.partial_block = stream[blocks * self.block_size:].copy()
+
+    def monobit_p(self):
+        s_obs = abs(2 * self.ones - self.bits) / math.sqrt(self.bits)
+        return math.erfc(s_obs / math.sqrt(2))
+
+    def runs_p(self):
+        pi = self.ones / self.bits
+        if abs(pi - 0.5) >= 2 / math.sqrt(self.bits):
+            return 0.0  # The frequency prerequisite failed, the runs test does not apply
+        runs = self.transitions + 1
+        expected_runs = 2 * self.bits * pi * (1 - pi)
+        return math.erfc(abs(runs - expected_runs) / (2 * math.sqrt(2 * self.bits) * pi * (1 - pi)))
+
+    def block_frequency_p(self):
+        if not self.blocks:
+            return None
+        chi_squared = 4 * self.block_size * self.block_chi_sum
+        return igamc(self.blocks / 2, chi_squared / 2)
+
+    def serial_correlation(self):
+        # For 0/1 bits x^2 = x, so every sum the coefficient needs is a count
+        n, ones, pairs = self.bits, self.ones, self.adjacent_ones
+        denominator = n * ones - ones * ones
+        return (n * pairs - ones * ones) / denominator if denominator else None
+
+    def results(self):
+        if self.bits < MIN_TEST_BITS:
+            return {"keys": self.keys, "bits": self.bits}
+        return {
+            "keys": self.keys,
+            "bits": self.bits,
+            "monobit_p": self.monobit_p(),
+            "runs_p": self.runs_p(),
+            "block_frequency_p": self.block_frequency_p(),
+            "serial_correlation": self.serial_correlation()
+        }
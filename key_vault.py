@@ -0,0 +1,282 @@
+import bisect
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from key_quality import PackedKey
+
+# Keys are stored by run and session as run << RUN_SHIFT | session, so every run of c_program,
+# whose sessions start again from 0, sorts after the one before. Stores written before runs
+# existed read as run 0.
+RUN_SHIFT = 32
+SESSION_MASK = (1 << RUN_SHIFT) - 1
+# magic, CRC-32 of the compressed payload, payload length, key count, first and last run and session
+CHUNK_HEADER = struct.Struct("<4sIIIqq")
+CHUNK_MAGIC = b"QKDV"
+# run and session and key length in bits, followed by the packed key bytes
+KEY_RECORD = struct.Struct("<qI")
+# first run and session, last run and session, byte offset and size of the chunk, key count
+INDEX_RECORD = struct.Struct("<qqqII")
+
+
+def pack_chunk(entries):
+    records = []
+    for session, key in entries:
+        records.append(KEY_RECORD.pack(session, key.length))
+        records.append(key.packed)
+    payload = zlib.compress(b"".join(records))
+    header = CHUNK_HEADER.pack(CHUNK_MAGIC, zlib.crc32(payload), len(payload), len(entries), entries[0][0], entries[-1][0])
+    return header + payload
+
+
+def unpack_chunk(payload: bytes, count: int):
+    data = zlib.decompress(payload)
+    position = 0
+    for _ in range(count):
+        session, length = KEY_RECORD.unpack_from(data, position)
+        position += KEY_RECORD.size
+        size = (length + 7) // 8
+        yield session, PackedKey(data[position:position + size], length)
+        position += size
+
+
+class KeyVault:
+    # Append-only store of every distilled key by run and session number. Keys are written in zlib
+    # compressed chunks with a CRC-32 each to `path`, and every chunk gets a fixed-size record in
+    # the `path`.idx index, which is all that is kept in memory. append() only queues the key: a
+    # writer thread turns the queue into a chunk when it holds `chunk_keys` keys or every
+    # `fsync_interval` seconds, and fsyncs both files on that cadence. Lookups bisect the index
+    # and read only the chunks that overlap the requested sessions. The writer also sorts keys
+    # into runs: a session at or before the last one stored is skipped if the current run
+    # already holds that very key, as when the same file is read again after a resume or seek,
+    # and otherwise starts a new run. Comparing may read a chunk back, off the parser's thread.
+    def __init__(self, path: str, fsync_interval: float = 5.0, chunk_keys: int = 1024):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.fsync_interval = fsync_interval
+        self.chunk_keys = chunk_keys
+        self.condition = threading.Condition()
+        self.pending = []  # (session, key) waiting for the writer
+        self.cached_chunk = (None, {})  # Offset and run and session -> key of the last chunk read by stored_key()
+        self.appended = 0  # Keys accepted by append()
+        self.durable = 0  # Keys written and fsynced
+        self.closing = False
+        self.flush_requested = False
+        self.firsts = []
+        self.lasts = []
+        self.offsets = []
+        self.sizes = []
+        self.counts = []
+        self.run = 0
+        self.last_session = -1  # Last session stored in the current run, kept by the writer
+        self.load()
+        self.data_file = open(self.path, "ab")
+        self.index_file = open(self.index_path, "ab")
+        self.thread = threading.Thread(target=self.write_loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __len__(self):
+        return sum(self.counts) + len(self.pending)
+
+    def load(self):
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+            usable = len(data) - len(data) % INDEX_RECORD.size
+            for record in INDEX_RECORD.iter_unpack(data[:usable]):
+                self.remember(*record)
+        data_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        # Index records written before a crash whose chunk did not make it to disk
+        while self.offsets and self.offsets[-1] + self.sizes[-1] > data_size:
+            for column in (self.firsts, self.lasts, self.offsets, self.sizes, self.counts):
+                column.pop()
+        last = self.lasts[-1] if self.lasts else -1
+        end = self.offsets[-1] + self.sizes[-1] if self.offsets else 0
+        recovered = 0
+        if end == 0 and data_size >= len(CHUNK_MAGIC):
+            with open(self.path, "rb") as f:
+                if f.read(len(CHUNK_MAGIC)) != CHUNK_MAGIC:
+                    # Not a torn first chunk but some other file, which must not be truncated
+                    raise ValueError(f"{self.path} is not a key vault")
+        if data_size > end:
+            # Chunks written after the last index record, kept up to the first one that is torn
+            with open(self.path, "rb") as f:
+                while True:
+                    chunk = self.read_chunk(f, end)
+                    if chunk is None:
+                        break
+                    crc, length, count, first, last = chunk[0]
+                    self.remember(first, last, end, CHUNK_HEADER.size + length, count)
+                    recovered += 1
+                    end += CHUNK_HEADER.size + length
+            if end < data_size:
+                logging.warning(f"Dropping {data_size - end} bytes of incomplete chunk data from {self.path}")
+                with open(self.path, "r+b") as f:
+                    f.truncate(end)
+        if last >= 0:
+            self.run = last >> RUN_SHIFT
+            self.last_session = last & SESSION_MASK
+        with open(self.index_path, "wb") as f:
+            f.write(b"".join(INDEX_RECORD.pack(*record) for record in zip(self.firsts, self.lasts, self.offsets, self.sizes, self.counts)))
+        if self.counts:
+            logging.info(f"Loaded {sum(self.counts)} keys in {len(self.counts)} chunks from {self.path}"
+                         f"{f', recovered {recovered} unindexed chunks' if recovered else ''}")
+
+    def read_chunk(self, f, offset: int):
+        # Header fields and payload of the chunk at `offset`, or None if it is missing, torn or fails its CRC
+        f.seek(offset)
+        header = f.read(CHUNK_HEADER.size)
+        if len(header) < CHUNK_HEADER.size:
+            return None
+        magic, crc, length, count, first, last = CHUNK_HEADER.unpack(header)
+        if magic != CHUNK_MAGIC:
+            return None
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return None
+        return (crc, length, count, first, last), payload
+
+    def remember(self, first, last, offset, size, count):
+        self.firsts.append(first)
+        self.lasts.append(last)
+        self.offsets.append(offset)
+        self.sizes.append(size)
+        self.counts.append(count)
+
+    def append(self, session: int, key: PackedKey):
+        with self.condition:
+            self.pending.append((session, key))
+            self.appended += 1
+            if len(self.pending) >= self.chunk_keys:
+                self.condition.notify_all()
+
+    def assign_runs(self, batch):
+        # (run and session, key) for the keys of batch that are not stored yet. Writer thread only.
+        entries = []
+        batch_keys = {}
+        for session, key in batch:
+            if session <= self.last_session:
+                run_session = self.run << RUN_SHIFT | session
+                stored = batch_keys.get(run_session)
+                if stored is None:
+                    stored = self.stored_key(run_session)
+                if stored is not None and stored.length == key.length and stored.packed == key.packed:
+                    continue  # The same sessions read again after a resume or seek
+                with self.condition:
+                    self.run += 1
+                logging.info(f"Key vault {self.path}: session {session} after {self.last_session} starts run {self.run}")
+            self.last_session = session
+            run_session = self.run << RUN_SHIFT | session
+            entries.append((run_session, key))
+            batch_keys[run_session] = key
+        return entries
+
+    def stored_key(self, run_session: int):
+        # The key written for run_session, read back from its chunk. Writer thread only, which is
+        # also the only one that adds to the index.
+        start = bisect.bisect_left(self.lasts, run_session)
+        if start == len(self.lasts) or self.firsts[start] > run_session:
+            return None
+        offset, keys = self.cached_chunk
+        if offset != self.offsets[start]:
+            with open(self.path, "rb") as f:
+                chunk = self.read_chunk(f, self.offsets[start])
+            keys = dict(unpack_chunk(chunk[1], self.counts[start])) if chunk is not None else {}
+            self.cached_chunk = (self.offsets[start], keys)
+        return keys.get(run_session)
+
+    def write_loop(self):
+        next_sync = time.monotonic() + self.fsync_interval
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.closing or self.flush_requested or len(self.pending) >= self.chunk_keys,
+                                        timeout=max(0.0, next_sync - time.monotonic()))
+                batch, self.pending = self.pending, []
+                target = self.appended
+                sync = self.closing or self.flush_requested or time.monotonic() >= next_sync
+                self.flush_requested = False
+                closing = self.closing
+            try:
+                self.write_chunks(self.assign_runs(batch), sync)
+            except OSError as e:
+                logging.error(f"Failed to write keys to {self.path}: {e}")
+            if sync:
+                next_sync = time.monotonic() + self.fsync_interval
+                with self.condition:
+                    self.durable = target
+                    self.condition.notify_all()
+            if closing:
+                return
+
+    def write_chunks(self, entries, sync: bool):
+        # The chunks are flushed, and fsynced when a sync is due, before their index records are
+        # published, so neither keys() nor the index on disk ever points past the data written
+        records = []
+        for start in range(0, len(entries), self.chunk_keys):
+            chunk_entries = entries[start:start + self.chunk_keys]
+            chunk = pack_chunk(chunk_entries)
+            offset = self.data_file.tell()
+            self.data_file.write(chunk)
+            records.append((chunk_entries[0][0], chunk_entries[-1][0], offset, len(chunk), len(chunk_entries)))
+        self.data_file.flush()
+        if sync:
+            os.fsync(self.data_file.fileno())
+        if records:
+            with self.condition:
+                for record in records:
+                    self.remember(*record)
+            self.index_file.write(b"".join(INDEX_RECORD.pack(*record) for record in records))
+            self.index_file.flush()
+        if sync:
+            os.fsync(self.index_file.fileno())
+
+    def flush(self, timeout: float = 10.0):
+        # Waits until everything appended so far is written and fsynced
+        with self.condition:
+            target = self.appended
+            self.flush_requested = True
+            self.condition.notify_all()
+            return self.condition.wait_for(lambda: self.durable >= target or not self.thread.is_alive(), timeout=timeout)
+
+    def close(self):
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.data_file.close()
+        self.index_file.close()
+
+    def chunk_range(self, first_session: int, last_session: int):
+        # Positions of the index records that can hold sessions in [first_session, last_session]
+        with self.condition:
+            start = bisect.bisect_left(self.lasts, first_session)
+            stop = bisect.bisect_right(self.firsts, last_session)
+            return [(self.offsets[i], self.counts[i]) for i in range(start, stop)]
+
+    def keys(self, first_session: int, last_session: int, run: int = None):
+        # (session, PackedKey) for every stored key of `run`, the latest by default, in
+        # [first_session, last_session], in session order. Keys still waiting for the writer are
+        # not included until it has written them.
+        if run is None:
+            run = self.run
+        first = run << RUN_SHIFT | first_session
+        last = run << RUN_SHIFT | min(last_session, SESSION_MASK)
+        chunks = self.chunk_range(first, last)
+        if not chunks:
+            return
+        with open(self.path, "rb") as f:
+            for offset, count in chunks:
+                chunk = self.read_chunk(f, offset)
+                if chunk is None:
+                    raise ValueError(f"Chunk at offset {offset} of {self.path} is corrupt")
+                for run_session, key in unpack_chunk(chunk[1], count):
+                    if run_session > last:
+                        return
+                    if run_session >= first:
+                        yield run_session & SESSION_MASK, key
+
+    def key(self, session: int, run: int = None):
+        return next((key for _, key in self.keys(session, session, run)), None)
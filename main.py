@@ -23,23 +23,83 @@ if __name__ == "__main__":
     
     
     
+import argparse
+import os
 import sys
-from queue import Queue
-from PyQt6.QtWidgets import QApplication
-from gui import MainWindow
 from data_processor import DataProcessor
+from bounded_queue import BoundedQueue, QUEUE_POLICIES
+from key_vault import KeyVault
+from alarms import AlarmEngine, default_rules, load_rules
 
 def main():
-    mode = "file"  # Default to file mode
-    if len(sys.argv) > 1 and sys.argv[1] in ["console", "file"]:
-        mode = sys.argv[1]
-    
-    data_queue = Queue()
-    processor = DataProcessor(data_queue, mode=mode, input_string="default_input")
-    app = QApplication(sys.argv)
-    window = MainWindow(data_queue, processor)
+    parser = argparse.ArgumentParser(description="Quantum Key Distribution Output Analyzer")
+    parser.add_argument("mode", nargs="?", choices=["console", "file"], default="file")  # Default to file mode
+    parser.add_argument("--batch", action="store_true", help="queue one record per session instead of one item per value")
+    parser.add_argument("--spd-block-size", type=int, default=40, help="timestamps per SPD1_VALUES/SPD2_VALUES block")
+    parser.add_argument("--mmap-replay", action="store_true", help="replay existing output.txt content through a memory map before tailing it")
+    parser.add_argument("--no-session-index", action="store_true", help="do not build or use the output.txt.idx session index")
+    parser.add_argument("--queue-size", type=int, default=10000, help="maximum items waiting between the processor and the GUI")
+    parser.add_argument("--queue-policy", choices=QUEUE_POLICIES, default="coalesce", help="what to do when the queue is full")
+    parser.add_argument("--replay-speed", type=float, default=None, help="pace sessions at this multiple of the 500 ms session cadence (default: as fast as possible)")
+    parser.add_argument("--plot-window", type=float, default=60.0, help="seconds of history shown in the line graphs")
+    parser.add_argument("--hist-bins", type=int, default=40, help="number of bins in the SPD timestamp histograms")
+    parser.add_argument("--hist-bin-width", type=int, default=100, help="width of a histogram bin in ps")
+    parser.add_argument("--hist-start", type=int, default=0, help="start of the first histogram bin in ps")
+    parser.add_argument("--hist-period", type=int, default=None, help="period in ps that timestamps are folded by (default: bins x bin width)")
+    parser.add_argument("--hist-log", action="store_true", help="show histogram heights as log10(1 + count)")
+    parser.add_argument("--coincidence-window", type=int, default=100, help="largest |t2 - t1| in ps counted as an SPD1/SPD2 coincidence")
+    parser.add_argument("--correlation-bins", type=int, default=40, help="number of bins in the SPD1/SPD2 delay histogram, centred on zero")
+    parser.add_argument("--correlation-bin-width", type=int, default=50, help="width of a delay histogram bin in ps")
+    parser.add_argument("--key-vault", default=None, help="append every key to this compressed key store (index in PATH.idx)")
+    parser.add_argument("--key-vault-fsync", type=float, default=5.0, help="seconds between key store writes and fsyncs")
+    parser.add_argument("--alarm-rules", default=None, help="JSON file of alarm rules to use instead of the built-in QBER and visibility rules")
+    parser.add_argument("--alarm-log", default=os.path.join("build", "alarms.log"), help="append raised and cleared alarms to this file as JSON lines")
+    parser.add_argument("--headless", action="store_true", help="run without the GUI and write periodic JSON summaries")
+    parser.add_argument("--summary-interval", type=float, default=10.0, help="seconds between headless summaries")
+    parser.add_argument("--summary-file", default=None, help="append headless summaries to this file instead of stdout")
+    parser.add_argument("--duration", type=float, default=None, help="stop a headless run after this many seconds")
+    args, qt_args = parser.parse_known_args()
+
+    data_queue = BoundedQueue(maxsize=args.queue_size, policy=args.queue_policy)
+    try:
+        key_vault = KeyVault(args.key_vault, fsync_interval=args.key_vault_fsync) if args.key_vault else None
+    except (OSError, ValueError) as e:
+        parser.error(f"cannot open key vault {args.key_vault}: {e}")
+    try:
+        alarm_rules = load_rules(args.alarm_rules) if args.alarm_rules else default_rules()
+    except (OSError, ValueError, TypeError) as e:
+        parser.error(f"cannot load alarm rules from {args.alarm_rules}: {e}")
+    alarm_engine = AlarmEngine(alarm_rules, log_path=args.alarm_log)
+    correlation_options = {"bins": args.correlation_bins, "bin_width": args.correlation_bin_width, "window": args.coincidence_window}
+    processor = DataProcessor(data_queue, mode=args.mode, input_string="default_input", batch_sessions=args.batch,
+                              spd_block_size=args.spd_block_size, mmap_replay=args.mmap_replay,
+                              index_sessions=not args.no_session_index, replay_speed=args.replay_speed,
+                              key_vault=key_vault, alarm_engine=alarm_engine, correlation_options=correlation_options,
+                              stats_window=args.plot_window)
+    if args.headless:
+        # Imported here so that a headless run never loads PyQt6 or pyqtgraph
+        from headless import run_headless
+        if qt_args:
+            parser.error(f"unrecognized arguments: {' '.join(qt_args)}")
+        run_headless(data_queue, processor, args)
+        if key_vault is not None:
+            key_vault.close()
+        alarm_engine.close()
+        return
+
+    from PyQt6.QtWidgets import QApplication
+    from gui import MainWindow
+    app = QApplication(sys.argv[:1] + qt_args)
+    histogram_options = {"bins": args.hist_bins, "bin_width": args.hist_bin_width, "start": args.hist_start,
+                         "period": args.hist_period, "log_counts": args.hist_log}
+    window = MainWindow(data_queue, processor, plot_window=args.plot_window, histogram_options=histogram_options,
+                        correlation_options=correlation_options)
     window.show()
-    sys.exit(app.exec())
+    status = app.exec()
+    if key_vault is not None:
+        key_vault.close()
+    alarm_engine.close()
+    sys.exit(status)
 
 if __name__ == "__main__":
     main()
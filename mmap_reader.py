@@ -0,0 +1,92 @@
+import logging
+import mmap
+import os
+import numpy as np
+
+NEWLINE = ord("\n")
+DIGIT_0 = ord("0")
+DIGIT_9 = ord("9")
+
+
+class MmapReader:
+    # Replays what is already in an output file straight from a memory map. Newlines are found
+    # with NumPy one chunk at a time, runs of timestamp lines go to the processor as one slice,
+    # and only the short scalar lines are decoded. tell() is the offset after the last line handed
+    # to the processor, so stop()/resume keep working as they do with a regular file.
+    def __init__(self, path: str, position: int = 0, chunk_size: int = 16 * 1024 * 1024):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        if position > self.size:
+            logging.warning(f"Position {position} is past the end of {path}, starting from the beginning")
+            position = 0
+        self.position = position
+        self.line_offset = position
+
+    @property
+    def closed(self):
+        return self.file.closed
+
+    def tell(self):
+        return self.position
+
+    def replay(self, processor):
+        if self.map is None:
+            return
+        chunk_start = self.position
+        while chunk_start < self.size and not processor.stop_event.is_set():
+            chunk_end = min(chunk_start + self.chunk_size, self.size)
+            buffer = np.frombuffer(self.map, dtype=np.uint8, count=chunk_end - chunk_start, offset=chunk_start)
+            line_ends = np.flatnonzero(buffer == NEWLINE)
+            del buffer
+            if not len(line_ends):
+                if chunk_end == self.size:
+                    break  # Only a partial line is left, the tail picks it up once it is complete
+                chunk_start = chunk_end
+                continue
+            line_ends += chunk_start
+            line_starts = np.empty_like(line_ends)
+            line_starts[0] = self.position
+            line_starts[1:] = line_ends[:-1] + 1
+            first_bytes = np.frombuffer(self.map, dtype=np.uint8, count=self.size)[np.minimum(line_starts, self.size - 1)]
+            is_timestamp = (first_bytes >= DIGIT_0) & (first_bytes <= DIGIT_9) & (line_ends > line_starts)
+            # Lines are handled in runs: a run of timestamp lines is one call, other lines one call each
+            boundaries = np.flatnonzero(is_timestamp[1:] != is_timestamp[:-1]) + 1
+            run_starts = np.concatenate(([0], boundaries)).tolist()
+            run_ends = np.concatenate((boundaries, [len(line_ends)])).tolist()
+            run_is_timestamp = is_timestamp[run_starts].tolist()
+            line_starts = line_starts.tolist()
+            line_ends = line_ends.tolist()
+            for first, last, timestamps in zip(run_starts, run_ends, run_is_timestamp):
+                if processor.stop_event.is_set():
+                    return
+                if timestamps:
+                    start, end = line_starts[first], line_ends[last - 1]
+                    self.position = end + 1
+                    processor.handle_timestamp_block(self.map[start:end])
+                    continue
+                for index in range(first, last):
+                    start, end = line_starts[index], line_ends[index]
+                    self.line_offset = start
+                    self.position = end + 1
+                    line = self.map[start:end].decode().strip()
+                    if line:
+                        processor.parse_and_queue(line)
+                    else:
+                        processor.complete_session()
+                    if processor.stop_event.is_set():
+                        return
+            chunk_start = self.position
+
+    def interrupt(self):
+        pass  # replay() checks the processor's stop_event between lines, there is no wait to wake
+
+    def close(self):
+        # Called by the replay thread once it is done with the map, so no view of it is still held
+        if self.file.closed:
+            return
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
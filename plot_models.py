@@ -0,0 +1,250 @@
+import numpy as np
+from history import HistoryPyramid
+from ring_buffer import TimeSeriesBuffer
+from correlation import SessionCorrelation, check_correlation_options
+
+# Pixel columns a series snapshot is decimated to, enough for the widest plot plus some zoom
+SNAPSHOT_COLUMNS = 4096
+
+
+def minmax_decimate(x, y, x_min, x_max, columns):
+    # Reduces the samples between x_min and x_max to their min and max per pixel column, which
+    # draws the same envelope as the full data. The two are real samples, kept at their own x and
+    # in x order, so a point looked up on the result is one of the data. One sample either side
+    # of the range is kept so the line runs to the edges, and slices that already fit are
+    # returned as they are.
+    first = max(int(np.searchsorted(x, x_min)) - 1, 0)
+    last = min(int(np.searchsorted(x, x_max, side="right")) + 1, len(x))
+    x, y = x[first:last], y[first:last]
+    columns = max(int(columns), 1)
+    if len(x) <= 2 * columns:
+        return x, y
+    span = x[-1] - x[0]
+    if span <= 0:
+        extremes = [int(np.argmin(y)), int(np.argmax(y))]
+        extremes.sort()
+        return x[extremes], y[extremes]
+    column = ((x - x[0]) * (columns / span)).astype(np.int64)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(column)) + 1))
+    sizes = np.diff(np.append(starts, len(x)))
+    # First index of each column's min and max: indices of other samples are masked past the end
+    indices = np.arange(len(x))
+    min_index = np.minimum.reduceat(np.where(y == np.repeat(np.minimum.reduceat(y, starts), sizes), indices, len(x)), starts)
+    max_index = np.minimum.reduceat(np.where(y == np.repeat(np.maximum.reduceat(y, starts), sizes), indices, len(x)), starts)
+    kept = np.empty(2 * len(starts), dtype=np.int64)
+    kept[0::2] = np.minimum(min_index, max_index)
+    kept[1::2] = np.maximum(min_index, max_index)
+    return x[kept], y[kept]
+
+
+def frozen_copy(array):
+    array = np.array(array)
+    array.flags.writeable = False
+    return array
+
+
+class HistogramSnapshot:
+    # Read-only copy of a HistogramModel's counts for one frame, with the same attributes the
+    # views read from the model, so it can be drawn while the model keeps counting on another thread
+    def __init__(self, model):
+        self.bins = model.bins
+        self.bin_width = model.bin_width
+        self.edges = model.edges
+        self.centers = model.centers
+        self.counts = frozen_copy(model.counts)
+
+
+class SeriesSnapshot:
+    # Read-only copy of a SeriesModel for one range: its points decimated to a number of columns,
+    # and the min and max of the live window, or of the whole range once it reaches into history
+    def __init__(self, x, y, y_min, y_max):
+        self.x = frozen_copy(x)
+        self.y = frozen_copy(y)
+        self.y_min = y_min
+        self.y_max = y_max
+
+    def __len__(self):
+        return len(self.x)
+
+    def min(self):
+        return self.y_min
+
+    def max(self):
+        return self.y_max
+
+    def view(self, x_min: float, x_max: float, columns: int):
+        return minmax_decimate(self.x, self.y, x_min, x_max, columns)
+
+
+class PlotModel:
+    # Data behind one metric. Any number of views subscribe to it and are handed the model itself,
+    # or a snapshot of it, on refresh, so they share one copy of the data and it is updated once
+    # per sample however many plots show it. Views implement refresh(model, frame) and reset(model).
+    def __init__(self):
+        self.views = []
+        self.changed = False
+
+    def subscribe(self, view):
+        self.views.append(view)
+
+    def unsubscribe(self, view):
+        self.views.remove(view)
+
+    def refresh_views(self, frame, data=None):
+        # data is a snapshot of this model when the model itself is updated on another thread
+        for view in self.views:
+            view.refresh(self if data is None else data, frame)
+
+    def reset_views(self, data=None):
+        for view in self.views:
+            view.reset(self if data is None else data)
+
+    def snapshot(self, x_min: float, x_max: float):
+        # A read-only copy of what the views draw for [x_min, x_max]. Taking it clears changed.
+        raise NotImplementedError
+
+
+class HistogramModel(PlotModel):
+    # Counts of SPD timestamps folded modulo `period` ps (bins * bin_width by default) into `bins`
+    # bins of `bin_width` ps starting at `start`. Timestamps that fold outside the bins are not
+    # counted.
+    def __init__(self, bins: int = 40, bin_width: int = 100, start: int = 0, period: int = None):
+        super().__init__()
+        if bins < 1 or bin_width < 1:
+            raise ValueError(f"Histogram needs at least one bin of at least 1 ps, got {bins} x {bin_width} ps")
+        self.bins = bins
+        self.bin_width = bin_width
+        self.start = start
+        self.period = period or bins * bin_width
+        if self.period < 1:
+            raise ValueError(f"Histogram period must be positive, got {self.period} ps")
+        self.counts = np.zeros(bins)
+        self.edges = start + np.arange(bins + 1) * bin_width
+        self.centers = self.edges[:-1] + bin_width / 2
+        self.covers_period = start == 0 and self.period == bins * bin_width
+
+    def add(self, timestamps):
+        if len(timestamps) == 0:
+            return
+        indices = (timestamps % self.period - self.start) // self.bin_width
+        if not self.covers_period:
+            indices = indices[(indices >= 0) & (indices < self.bins)]
+        counts = np.bincount(indices, minlength=self.bins)
+        self.counts += counts
+        self.changed = True
+
+    def clear(self):
+        self.counts.fill(0)
+        self.changed = True
+
+    def snapshot(self, x_min: float, x_max: float):
+        self.changed = False
+        return HistogramSnapshot(self)
+
+
+class SeriesModel(PlotModel):
+    # One scalar metric such as QBER or visibility: every sample of the live window, plus a
+    # history pyramid of min/mean/max buckets for ranges that reach further back
+    def __init__(self, window: float = 60.0):
+        super().__init__()
+        self.buffer = TimeSeriesBuffer(window)
+        self.history = HistoryPyramid()
+
+    def __len__(self):
+        return len(self.buffer)
+
+    @property
+    def x(self):
+        return self.buffer.x
+
+    @property
+    def y(self):
+        return self.buffer.y
+
+    def min(self):
+        return self.buffer.min()
+
+    def max(self):
+        return self.buffer.max()
+
+    def append(self, t: float, value: float):
+        self.buffer.append(t, value)
+        self.history.add(t, value)
+        self.changed = True
+
+    def clear(self):
+        self.buffer.clear()
+        self.history.clear()
+        self.changed = True
+
+    def in_live_window(self, x_min: float):
+        return not len(self.buffer) or x_min >= self.buffer.x[-1] - self.buffer.window
+
+    def view(self, x_min: float, x_max: float, columns: int):
+        # Points to draw for [x_min, x_max] at `columns` pixels: the raw samples while the range is
+        # inside the live window, the history envelope once it reaches further back
+        if self.in_live_window(x_min):
+            return minmax_decimate(self.x, self.y, x_min, x_max, columns)
+        x_data, y_data = self.history.envelope(x_min, x_max, columns)
+        return minmax_decimate(x_data, y_data, x_min, x_max, columns)
+
+    def range_snapshot(self, x_min: float, x_max: float, columns: int = SNAPSHOT_COLUMNS):
+        # Leaves changed alone, so a view can ask for the range it zoomed to between frames. Past
+        # the live window the y range also covers the envelope drawn from the history, which keeps
+        # its min and max through decimation.
+        x_data, y_data = self.view(x_min, x_max, columns)
+        y_min, y_max = self.min(), self.max()
+        if not self.in_live_window(x_min) and len(y_data):
+            y_min = min(y_min, float(y_data.min()))
+            y_max = max(y_max, float(y_data.max()))
+        return SeriesSnapshot(x_data, y_data, y_min, y_max)
+
+    def snapshot(self, x_min: float, x_max: float):
+        self.changed = False
+        return self.range_snapshot(x_min, x_max)
+
+
+class CorrelationSnapshot(HistogramSnapshot):
+    def __init__(self, model):
+        super().__init__(model)
+        self.window = model.window
+        self.coincidences = model.coincidences
+        self.session_coincidences = model.session_coincidences
+        self.sessions = model.sessions
+
+
+class CorrelationModel(PlotModel):
+    # Running totals of the SessionCorrelation results a Correlator with the same options queues:
+    # the number of coincidences within `window` ps, in total and for the last session, and the
+    # histogram of t2 - t1. The histogram attributes match HistogramModel's, so the same views draw it.
+    def __init__(self, bins: int = 40, bin_width: int = 50, window: int = 100):
+        super().__init__()
+        check_correlation_options(bins, bin_width, window)
+        self.bins = bins
+        self.bin_width = bin_width
+        self.window = window
+        self.max_delay = bins // 2 * bin_width
+        self.counts = np.zeros(bins)
+        self.edges = -self.max_delay + np.arange(bins + 1) * bin_width
+        self.centers = self.edges[:-1] + bin_width / 2
+        self.coincidences = 0
+        self.session_coincidences = 0
+        self.sessions = 0
+
+    def add(self, result: SessionCorrelation):
+        self.sessions += result.sessions
+        self.coincidences += result.coincidences
+        self.session_coincidences = result.last_coincidences
+        self.counts += result.counts
+        self.changed = True
+
+    def clear(self):
+        self.counts.fill(0)
+        self.coincidences = 0
+        self.session_coincidences = 0
+        self.sessions = 0
+        self.changed = True
+
+    def snapshot(self, x_min: float, x_max: float):
+        self.changed = False
+        return CorrelationSnapshot(self)
@@ -0,0 +1,188 @@
+import logging
+import threading
+import time
+from queue import Empty
+from aggregator import Aggregator
+
+FRAME_INTERVAL = 0.02  # Seconds between frames while data is flowing
+IDLE_INTERVAL = 0.25  # Seconds between checks when nothing is queued or waiting to be drawn
+DRAIN_FRAME_SHARE = 0.8  # Share of a frame one drain pass may spend before a snapshot is published
+
+class RenderSnapshot:
+    # What the GUI needs to draw one frame: snapshots of the plot models that changed, keyed by
+    # model, and the session, key text, key quality results and non-plot changes of the aggregator
+    # at that point.
+    # Built on the worker thread and not modified after it is published.
+    def __init__(self, session, session_time, plots, key_text, key_quality, changes):
+        self.session = session
+        self.session_time = session_time
+        self.plots = plots
+        self.key_text = key_text
+        self.key_quality = key_quality
+        self.changes = changes
+
+    def merged_into(self, previous):
+        # A snapshot the GUI has not picked up yet is folded into the next one, so the changes it
+        # carried are not lost when frames are skipped
+        plots = dict(previous.plots)
+        plots.update(self.plots)
+        return RenderSnapshot(self.session, self.session_time, plots, self.key_text, self.key_quality, previous.changes | self.changes)
+
+
+class RenderWorker:
+    # Owns an Aggregator on its own thread: drains the DataProcessor queue into it as items arrive
+    # and publishes a RenderSnapshot at most once per `frame_interval` seconds when something
+    # changed. The GUI only swaps in the latest snapshot, so parsing bursts never hold up input
+    # handling or resizing. The aggregator is only touched under `lock`.
+    # Each drain pass is sized from the queue depth and the measured time per item to fit in a
+    # frame, so snapshots keep coming while a burst is worked off, and with nothing queued or
+    # pending the thread waits for data at IDLE_INTERVAL instead of waking every frame.
+    # Snapshots of a range a view was zoomed or panned to are taken with request_view(), which
+    # never waits for a drain pass: a request made during one is served by the worker after it.
+    def __init__(self, data_queue, aggregator: Aggregator, view_span: float = 60.0, frame_interval: float = FRAME_INTERVAL):
+        self.data_queue = data_queue
+        self.aggregator = aggregator
+        self.view_span = view_span
+        self.frame_interval = frame_interval
+        self.lock = threading.Lock()
+        self.snapshot_lock = threading.Lock()
+        self.latest = None
+        self.view_requests = {}  # View -> (models, x_min, x_max, columns) waiting for the worker
+        self.views = {}  # View -> range and snapshots the worker took for it, until take_views()
+        self.item_time = 1e-4  # Moving average of the seconds one queue item takes to aggregate
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.run)
+            self.thread.daemon = True
+            self.thread.start()
+            logging.info("Render worker started")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+    def run(self):
+        next_frame = 0.0
+        while not self.stop_event.is_set():
+            try:
+                data = self.data_queue.get(timeout=self.frame_interval if self.pending() or self.view_requests else IDLE_INTERVAL)
+            except Empty:
+                data = None
+            with self.lock:
+                if data is not None:
+                    started = time.perf_counter()
+                    self.aggregator.process(data)
+                    count = 1 + self.aggregator.drain(self.data_queue, self.drain_budget())
+                    self.measure(count, time.perf_counter() - started)
+                now = time.monotonic()
+                if now >= next_frame and self.pending():
+                    self.publish(self.build_snapshot())
+                    next_frame = now + self.frame_interval
+                if self.view_requests:
+                    self.serve_view_requests()
+
+    def drain_budget(self):
+        # As much of the queue as fits in one frame at the measured rate
+        return min(self.data_queue.qsize(), max(1, int(self.frame_interval * DRAIN_FRAME_SHARE / self.item_time)))
+
+    def measure(self, count, elapsed):
+        self.item_time = 0.8 * self.item_time + 0.2 * max(elapsed / count, 1e-7)
+
+    def current_lag(self):
+        # Seconds of work queued right now at the measured rate, read from the GUI thread on every
+        # tick so that the figure keeps moving while the worker is stuck in a long pass
+        return self.data_queue.qsize() * self.item_time
+
+    def pending(self):
+        return bool(self.aggregator.changes) or any(model.changed for model in self.aggregator.plot_models)
+
+    def build_snapshot(self, all_models=False):
+        aggregator = self.aggregator
+        x_max = aggregator.session_time
+        x_min = max(0, x_max - self.view_span)
+        plots = {}
+        for model in aggregator.plot_models:
+            if model.changed or all_models:
+                plots[model] = model.snapshot(x_min, x_max)
+        snapshot = RenderSnapshot(aggregator.current_session, aggregator.session_time, plots,
+                                  aggregator.key_text, aggregator.key_quality_results, frozenset(aggregator.changes))
+        aggregator.changes.clear()
+        return snapshot
+
+    def publish(self, snapshot):
+        with self.snapshot_lock:
+            if self.latest is not None:
+                snapshot = snapshot.merged_into(self.latest)
+            self.latest = snapshot
+
+    def take_snapshot(self):
+        # The newest snapshot not yet taken, or None if nothing changed since the last one
+        with self.snapshot_lock:
+            snapshot, self.latest = self.latest, None
+        return snapshot
+
+    def request_view(self, view, models, x_min: float, x_max: float, columns: int):
+        # Snapshots of the series models for the range a view was zoomed or panned to, at that
+        # view's own width, so zooming in shows the raw samples rather than the frame snapshot's
+        # envelope. Returned right away if the aggregator is free; during a drain pass the request
+        # is left for the worker, None is returned and take_views() hands the snapshots over later.
+        request = (models, x_min, x_max, columns)
+        if self.lock.acquire(blocking=False):
+            try:
+                with self.snapshot_lock:
+                    self.view_requests.pop(view, None)
+                return self.view_snapshots(request)
+            finally:
+                self.lock.release()
+        with self.snapshot_lock:
+            self.view_requests[view] = request
+        return None
+
+    def view_snapshots(self, request):
+        models, x_min, x_max, columns = request
+        return (x_min, x_max), [model.range_snapshot(x_min, x_max, columns) for model in models]
+
+    def serve_view_requests(self):
+        with self.snapshot_lock:
+            requests, self.view_requests = self.view_requests, {}
+        views = {view: self.view_snapshots(request) for view, request in requests.items()}
+        with self.snapshot_lock:
+            self.views.update(views)
+
+    def take_views(self):
+        # View -> (range, snapshots) for the requests the worker served since the last call
+        with self.snapshot_lock:
+            views, self.views = self.views, {}
+        return views
+
+    def set_view_span(self, view_span: float):
+        # Returns the snapshot for the new span right away, so it is drawn even while the timer is stopped
+        with self.lock:
+            self.view_span = view_span
+            for model in self.aggregator.line_models:
+                model.changed = True
+            self.publish(self.build_snapshot())
+        return self.take_snapshot()
+
+    def reset(self):
+        # Clears the aggregator and returns a snapshot of every model for the views to reset to.
+        # Items still queued are from the processor that was just stopped and are dropped with it.
+        with self.lock:
+            try:
+                while True:
+                    self.data_queue.get_nowait()
+            except Empty:
+                pass
+            self.aggregator.reset()
+            snapshot = self.build_snapshot(all_models=True)
+        with self.snapshot_lock:
+            self.latest = None
+            self.view_requests.clear()
+            self.views.clear()
+        return snapshot
@@ -0,0 +1,81 @@
+import math
+from collections import deque
+import numpy as np
+from data_processor import SESSION_INTERVAL
+
+
+class TimeSeriesBuffer:
+    # Time-windowed (x, y) series kept in preallocated NumPy arrays. Samples are written after the
+    # live window and it is moved back to the front of the arrays only when they run out, so appends
+    # and trims are amortized O(1) and x/y are always contiguous views that can be plotted as they are.
+    # The window's min and max are kept in monotonic deques of (sample number, value), which are
+    # also amortized O(1) per sample instead of a scan of the whole window.
+    def __init__(self, window: float = 60.0, capacity: int = None):
+        self.window = window
+        # One sample per session is the normal rate, the slack covers gap-filled repeats
+        self.capacity = capacity or 2 * int(math.ceil(window / SESSION_INTERVAL)) + 16
+        self.times = np.empty(2 * self.capacity, dtype=np.float64)
+        self.values = np.empty(2 * self.capacity, dtype=np.float64)
+        self.start = 0
+        self.end = 0
+        self.offset = 0  # Sample number of times[0]
+        self.minima = deque()
+        self.maxima = deque()
+
+    def __len__(self):
+        return self.end - self.start
+
+    @property
+    def x(self):
+        return self.times[self.start:self.end]
+
+    @property
+    def y(self):
+        return self.values[self.start:self.end]
+
+    def append(self, t: float, value: float):
+        if self.end > self.start and t < self.times[self.end - 1]:
+            self.clear()  # Time went backwards, so this is a new run of the output file
+        if self.end == len(self.times):
+            self.compact()
+        self.times[self.end] = t
+        self.values[self.end] = value
+        sample = self.offset + self.end
+        self.end += 1
+        while self.minima and self.minima[-1][1] >= value:
+            self.minima.pop()
+        self.minima.append((sample, value))
+        while self.maxima and self.maxima[-1][1] <= value:
+            self.maxima.pop()
+        self.maxima.append((sample, value))
+        cutoff = t - self.window
+        if self.times[self.start] < cutoff:
+            self.start += int(np.searchsorted(self.times[self.start:self.end], cutoff))
+        if self.end - self.start > self.capacity:
+            self.start = self.end - self.capacity
+        first = self.offset + self.start
+        while self.minima[0][0] < first:
+            self.minima.popleft()
+        while self.maxima[0][0] < first:
+            self.maxima.popleft()
+
+    def min(self):
+        return self.minima[0][1] if self.minima else None
+
+    def max(self):
+        return self.maxima[0][1] if self.maxima else None
+
+    def compact(self):
+        count = self.end - self.start
+        self.times[:count] = self.times[self.start:self.end]
+        self.values[:count] = self.values[self.start:self.end]
+        self.offset += self.start
+        self.start = 0
+        self.end = count
+
+    def clear(self):
+        self.offset += self.end
+        self.start = 0
+        self.end = 0
+        self.minima.clear()
+        self.maxima.clear()
@@ -0,0 +1,220 @@
+import math
+from collections import deque
+
+EWMA_HALF_LIVES = (10.0, 60.0, 600.0)  # Seconds of session time
+QUANTILE_ACCURACY = 0.01  # Relative error of sketch quantiles
+QUANTILE_SLICES = 12  # Sketches a quantile window is split into
+REPORTED_QUANTILES = (0.05, 0.5, 0.95)
+MIN_SKETCH_MAGNITUDE = 1e-9  # Values closer to zero than this are counted as zero
+
+
+class Welford:
+    # Running count, mean and variance in one pass, numerically stable, and mergeable with
+    # Chan's pairwise update
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        count = self.count + other.count
+        if not count:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+
+class Ewma:
+    # Exponentially weighted moving average over time rather than samples, so a value's weight
+    # halves every `half_life` seconds however irregular the sessions are. The weighted sum is
+    # divided by the total weight, so the average is not pulled towards the first sample while
+    # less than a few half-lives of data have been seen.
+    def __init__(self, half_life: float):
+        self.half_life = half_life
+        self.value = None
+        self.weighted_sum = 0.0
+        self.total_weight = 0.0
+        self.last_time = None
+
+    def add(self, t: float, value: float):
+        if self.last_time is not None:
+            decay = 0.5 ** (max(t - self.last_time, 0.0) / self.half_life)
+            self.weighted_sum *= decay
+            self.total_weight *= decay
+        self.weighted_sum += value
+        self.total_weight += 1.0
+        self.value = self.weighted_sum / self.total_weight
+        self.last_time = t
+
+
+class QuantileSketch:
+    # Relative-error quantile sketch after DDSketch: each value is counted in the logarithmic
+    # bucket that holds it, so any quantile is within `relative_accuracy` of the true one.
+    # Updates are O(1), and two sketches merge by adding their bucket counts, or take a merged
+    # sketch back out by subtracting them.
+    def __init__(self, relative_accuracy: float = QUANTILE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value: float):
+        self.count += 1
+        if value > MIN_SKETCH_MAGNITUDE:
+            bucket = math.ceil(math.log(value) / self.log_gamma)
+            self.positive[bucket] = self.positive.get(bucket, 0) + 1
+        elif value < -MIN_SKETCH_MAGNITUDE:
+            bucket = math.ceil(math.log(-value) / self.log_gamma)
+            self.negative[bucket] = self.negative.get(bucket, 0) + 1
+        else:
+            self.zeros += 1
+
+    def merge(self, other):
+        for bucket, count in other.positive.items():
+            self.positive[bucket] = self.positive.get(bucket, 0) + count
+        for bucket, count in other.negative.items():
+            self.negative[bucket] = self.negative.get(bucket, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+
+    def subtract(self, other):
+        # other must have been merged into this sketch
+        for buckets, other_buckets in ((self.positive, other.positive), (self.negative, other.negative)):
+            for bucket, count in other_buckets.items():
+                remaining = buckets[bucket] - count
+                if remaining:
+                    buckets[bucket] = remaining
+                else:
+                    del buckets[bucket]
+        self.zeros -= other.zeros
+        self.count -= other.count
+
+    def bucket_value(self, bucket: int):
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def quantiles(self, qs):
+        # Values at the given ascending quantiles, from one pass over the buckets in value order
+        if not self.count:
+            return [None] * len(qs)
+        buckets = [(-self.bucket_value(bucket), count) for bucket, count in sorted(self.negative.items(), reverse=True)]
+        if self.zeros:
+            buckets.append((0.0, self.zeros))
+        buckets.extend((self.bucket_value(bucket), count) for bucket, count in sorted(self.positive.items()))
+        results = []
+        seen = 0
+        position = 0
+        for q in qs:
+            rank = q * (self.count - 1)
+            while seen + buckets[position][1] <= rank:
+                seen += buckets[position][1]
+                position += 1
+            results.append(buckets[position][0])
+        return results
+
+
+class WindowedQuantiles:
+    # Quantiles over the last `window` seconds: one QuantileSketch per 1/QUANTILE_SLICES of the
+    # window, and their merge kept up to date as samples arrive and slices expire, so a query
+    # only walks the merged buckets. Slices older than the window are dropped whole, so the
+    # samples covered reach back between window * (1 - 1/slices) and window.
+    def __init__(self, window: float, slices: int = QUANTILE_SLICES, relative_accuracy: float = QUANTILE_ACCURACY):
+        self.slice_width = window / slices
+        self.slice_count = slices
+        self.relative_accuracy = relative_accuracy
+        self.slices = deque()  # (slice number, sketch)
+        self.merged = QuantileSketch(relative_accuracy)
+
+    def add(self, t: float, value: float):
+        number = math.floor(t / self.slice_width)
+        if not self.slices or self.slices[-1][0] != number:
+            self.slices.append((number, QuantileSketch(self.relative_accuracy)))
+        self.slices[-1][1].add(value)
+        self.merged.add(value)
+        while self.slices[0][0] <= number - self.slice_count:
+            self.merged.subtract(self.slices.popleft()[1])
+
+    def sketch(self):
+        return self.merged
+
+    def quantiles(self, qs):
+        return self.merged.quantiles(qs)
+
+    def clear(self):
+        self.slices.clear()
+        self.merged = QuantileSketch(self.relative_accuracy)
+
+
+class MetricStats:
+    # Everything tracked for one metric: Welford mean and deviation since the start of the run,
+    # an EWMA per half-life and the quantiles of the last `window` seconds. Time going backwards
+    # means a new run of the output file and starts everything over.
+    def __init__(self, window: float = 60.0, half_lives=EWMA_HALF_LIVES):
+        self.window = window
+        self.half_lives = half_lives
+        self.clear()
+
+    def clear(self):
+        self.welford = Welford()
+        self.ewmas = [Ewma(half_life) for half_life in self.half_lives]
+        self.quantiles = WindowedQuantiles(self.window)
+        self.last_time = None
+        self.last_value = None
+
+    def add(self, t: float, value: float):
+        if self.last_time is not None and t < self.last_time:
+            self.clear()
+        self.welford.add(value)
+        for ewma in self.ewmas:
+            ewma.add(t, value)
+        self.quantiles.add(t, value)
+        self.last_time = t
+        self.last_value = value
+
+    def summary(self):
+        quantiles = self.quantiles.quantiles(REPORTED_QUANTILES)
+        return {
+            "count": self.welford.count,
+            "last": self.last_value,
+            "mean": self.welford.mean,
+            "std": self.welford.std(),
+            "ewma": {f"{ewma.half_life:g}s": ewma.value for ewma in self.ewmas},
+            "window_quantiles": {f"p{round(q * 100):02d}": value for q, value in zip(REPORTED_QUANTILES, quantiles)}
+        }
+
+
+class RollingStats:
+    # MetricStats for each named metric, created on its first sample
+    def __init__(self, window: float = 60.0, half_lives=EWMA_HALF_LIVES):
+        self.window = window
+        self.half_lives = half_lives
+        self.metrics = {}
+
+    def add(self, name: str, t: float, value: float):
+        stats = self.metrics.get(name)
+        if stats is None:
+            stats = self.metrics[name] = MetricStats(self.window, self.half_lives)
+        stats.add(t, value)
+        return stats
+
+    def clear(self):
+        self.metrics.clear()
+
+    def summary(self):
+        return {name: stats.summary() for name, stats in self.metrics.items()}
@@ -0,0 +1,108 @@
+import bisect
+import logging
+import math
+import os
+import struct
+import threading
+
+# session number, byte offset of its SESSION_NUMBER line, qber, visibility, kbps (NaN when missing)
+INDEX_RECORD = struct.Struct("<qqddd")
+
+
+class SessionIndex:
+    # Sidecar file next to an output file that maps each session to the byte offset of its
+    # SESSION_NUMBER line plus the session's scalar values. Entries are appended as sessions
+    # complete, so the index grows with the file and is picked up again on the next open.
+    def __init__(self, output_path: str, flush_every: int = 64):
+        self.output_path = output_path
+        self.path = output_path + ".idx"
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.offsets = {}
+        self.summaries = {}
+        self.sessions = []
+        self.last_offset = -1
+        self.pending = []
+        self.load()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        usable = len(data) - len(data) % INDEX_RECORD.size
+        for session, offset, qber, visibility, kbps in INDEX_RECORD.iter_unpack(data[:usable]):
+            self.remember(session, offset, (qber, visibility, kbps))
+        if self.sessions and not self.matches_output():
+            logging.info(f"{self.path} does not match {self.output_path}, rebuilding it")
+            self.reset()
+            return
+        if usable != len(data):
+            with open(self.path, "r+b") as f:
+                f.truncate(usable)
+        logging.info(f"Loaded {len(self.sessions)} sessions from {self.path}")
+
+    def matches_output(self):
+        # The output file is rewritten from scratch by every run of c_program, so check that the
+        # last indexed offset still holds the SESSION_NUMBER line it was recorded for
+        session = self.sessions[-1]
+        expected = f"SESSION_NUMBER:{session}\n".encode()
+        try:
+            with open(self.output_path, "rb") as f:
+                f.seek(self.offsets[session])
+                return f.read(len(expected)) == expected
+        except OSError:
+            return False
+
+    def remember(self, session, offset, summary):
+        self.offsets[session] = offset
+        self.summaries[session] = summary
+        self.sessions.append(session)
+        self.last_offset = offset
+
+    def add(self, session: int, offset: int, qber=None, visibility=None, kbps=None):
+        with self.lock:
+            if offset <= self.last_offset:
+                if self.offsets.get(session) == offset:
+                    return  # Already indexed, e.g. after a resume or seek
+                logging.info(f"{self.output_path} was rewritten, rebuilding {self.path}")
+                self.reset()
+            summary = tuple(math.nan if value is None else float(value) for value in (qber, visibility, kbps))
+            self.remember(session, offset, summary)
+            self.pending.append(INDEX_RECORD.pack(session, offset, *summary))
+            if len(self.pending) >= self.flush_every:
+                self.write_pending()
+
+    def write_pending(self):
+        if self.pending:
+            with open(self.path, "ab") as f:
+                f.write(b"".join(self.pending))
+            self.pending = []
+
+    def flush(self):
+        with self.lock:
+            self.write_pending()
+
+    def reset(self):
+        self.offsets = {}
+        self.summaries = {}
+        self.sessions = []
+        self.last_offset = -1
+        self.pending = []
+        open(self.path, "wb").close()
+
+    def offset(self, session: int):
+        return self.offsets.get(session)
+
+    def summary(self, session: int):
+        return self.summaries.get(session)
+
+    def first_session_from(self, session: int):
+        # Sessions are written in increasing order, so the nearest indexed session at or after
+        # `session` is a bisect away when the requested one is missing
+        with self.lock:
+            position = bisect.bisect_left(self.sessions, session)
+            return self.sessions[position] if position < len(self.sessions) else None